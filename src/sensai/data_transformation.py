@@ -1,12 +1,12 @@
-import copy
 import logging
 import re
 from abc import ABC, abstractmethod
-from typing import List, Sequence, Union, Dict, Callable, Any, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Union, Dict, Callable, Any, Optional, Set, Tuple, Pattern, FrozenSet, Iterable
 
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder, StandardScaler, MinMaxScaler
 
 from .columngen import ColumnGenerator
 from .util.string import orRegexGroup
@@ -14,6 +14,23 @@ from .util.string import orRegexGroup
 log = logging.getLogger(__name__)
 
 
+def _toValueArray(values: Iterable) -> np.ndarray:
+    """
+    :param values: a collection of values (e.g. a set)
+    :return: a one-dimensional numpy array containing the values (with an object dtype only if the values are not of a uniform
+        primitive type), which pandas operations such as isin can process without any further conversion
+    """
+    values = list(values)
+    if len(values) > 0 and not any(value is None for value in values):
+        # using pandas' type inference, mixed types are not coerced (as by numpy) and tuples are retained as values
+        return pd.Series(values).to_numpy()
+    # None is retained as a value only in an object array (pandas would infer a float dtype for e.g. {1, None}, converting None to NaN)
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
 class DataFrameTransformer(ABC):
     """
     Base class for data frame transformers, i.e. objects which can transform one data frame into another
@@ -68,6 +85,29 @@ class DataFrameTransformerChain:
         for transformer in self.dataFrameTransformers:
             transformer.fit(df)
 
+    def compile(self) -> "DataFrameTransformerChain":
+        """
+        Creates an equivalent chain in which adjacent transformers have been merged where possible, such that fewer
+        intermediate data frames need to be created when applying the chain.
+        Presently, sequences of consecutive DFTRenameColumns are merged into a single DFTRenameColumns instance, and
+        sequences of consecutive DFTModifyColumnVectorized instances modifying the same column are merged into a single
+        instance which applies the functions to the column's array in succession (without writing the intermediate results
+        back to the data frame, unless they require pandas' conversion, e.g. scalars, series or non-numeric results).
+
+        :return: the new chain (the transformer instances not affected by merging are shared with this chain)
+        """
+        transformers: List[DataFrameTransformer] = []
+        for transformer in self.dataFrameTransformers:
+            if len(transformers) > 0 and isinstance(transformer, DFTRenameColumns) and isinstance(transformers[-1], DFTRenameColumns):
+                transformers[-1] = transformers[-1].chain(transformer)
+            elif len(transformers) > 0 and type(transformer) == DFTModifyColumnVectorized \
+                    and type(transformers[-1]) in (DFTModifyColumnVectorized, _DFTModifyColumnVectorizedChain) \
+                    and transformer.column == transformers[-1].column:
+                transformers[-1] = transformers[-1].chain(transformer)
+            else:
+                transformers.append(transformer)
+        return DataFrameTransformerChain(transformers)
+
 
 class DFTRenameColumns(RuleBasedDataFrameTransformer):
     def __init__(self, columnsMap: Dict[str, str]):
@@ -79,18 +119,42 @@ class DFTRenameColumns(RuleBasedDataFrameTransformer):
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
         return df.rename(columns=self.columnsMap)
 
+    def chain(self, other: "DFTRenameColumns") -> "DFTRenameColumns":
+        """
+        :param other: the renaming to apply after this renaming
+        :return: a transformer which is equivalent to applying this transformer followed by the other transformer
+        """
+        columnsMap = {old: other.columnsMap.get(new, new) for old, new in self.columnsMap.items()}
+        for old, new in other.columnsMap.items():
+            if old not in self.columnsMap:
+                columnsMap[old] = new
+        return DFTRenameColumns(columnsMap)
+
 
 class DFTConditionalRowFilterOnColumn(RuleBasedDataFrameTransformer):
     """
     Filters a data frame by applying a boolean function to one of the columns and retaining only the rows
     for which the function returns True
     """
-    def __init__(self, column: str, condition: Callable[[Any], bool]):
+    def __init__(self, column: str, condition: Union[Callable[[Any], bool], Callable[[pd.Series], Sequence[bool]]], vectorized=False):
+        """
+        :param column: the column to which the condition is applied
+        :param condition: if vectorized is False, a boolean function which is applied to each individual value of the column;
+            if vectorized is True, a function which is applied to the entire column (a pandas.Series) and which returns a
+            boolean sequence of the same length (e.g. lambda s: s > 0)
+        :param vectorized: whether the condition is to be applied to the entire column at once. Vectorized conditions are much
+            faster than the application of a function to one value at a time and should be preferred wherever possible.
+        """
         self.column = column
         self.condition = condition
+        self.vectorized = vectorized
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[df[self.column].apply(self.condition)]
+        if self.vectorized:
+            return df[self.condition(df[self.column])]
+        # collecting the condition's results in a boolean array avoids the construction of an intermediate (boolean) Series;
+        # iterating over the Series (rather than its numpy array) passes boxed scalars (e.g. pd.Timestamp) to the condition
+        return df.iloc[np.fromiter(map(self.condition, df[self.column]), dtype=bool, count=len(df))]
 
 
 class DFTInSetComparisonRowFilterOnColumn(RuleBasedDataFrameTransformer):
@@ -101,9 +165,10 @@ class DFTInSetComparisonRowFilterOnColumn(RuleBasedDataFrameTransformer):
     def __init__(self, column: str, setToKeep: Set):
         self.setToKeep = setToKeep
         self.column = column
+        self._valuesToKeep = _toValueArray(setToKeep)  # converted once rather than by isin upon every application
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[df[self.column].isin(self.setToKeep)]
+        return df[df[self.column].isin(self._valuesToKeep)]
 
 
 class DFTNotInSetComparisonRowFilterOnColumn(RuleBasedDataFrameTransformer):
@@ -114,35 +179,45 @@ class DFTNotInSetComparisonRowFilterOnColumn(RuleBasedDataFrameTransformer):
     def __init__(self, column: str, setToDrop: Set):
         self.setToDrop = setToDrop
         self.column = column
+        self._valuesToDrop = _toValueArray(setToDrop)  # converted once rather than by isin upon every application
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[~df[self.column].isin(self.setToDrop)]
+        return df[~df[self.column].isin(self._valuesToDrop)]
 
 
-class DFTVectorizedConditionalRowFilterOnColumn(RuleBasedDataFrameTransformer):
-    def __init__(self, column: str, vectorizedCondition: Callable[[Any], Sequence[bool]]):
+class DFTVectorizedConditionalRowFilterOnColumn(DFTConditionalRowFilterOnColumn):
+    """
+    Filters a data frame by applying a vectorized condition to one of the columns and retaining only the rows
+    for which the condition is True
+    """
+    def __init__(self, column: str, vectorizedCondition: Callable[[pd.Series], Sequence[bool]]):
         """
-
-        :param column:
-        :param vectorizedCondition:
+        :param column: the column to which the condition is applied
+        :param vectorizedCondition: a function which is applied to the entire column (a pandas.Series) and which returns a
+            boolean sequence of the same length. For numeric columns, the function may also be a compiled ufunc (e.g. created
+            with numba.vectorize), which pandas applies to the column's underlying array.
         """
-        self.column = column
+        super().__init__(column, vectorizedCondition, vectorized=True)
         self.vectorizedCondition = vectorizedCondition
 
-    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[self.vectorizedCondition(df[self.column])]
-
 
 class DFTRowFilter(RuleBasedDataFrameTransformer):
-    def __init__(self, condition: Callable[[Any], bool]):
+    def __init__(self, condition: Callable[[Any], bool], namedTuples=False):
         """
         Filters a data frame by applying a boolean function to each row and retaining only the rows
         for which the function returns True
-        :param condition:
+
+        :param condition: the boolean function which is applied to each row
+        :param namedTuples: whether the rows are to be passed to the condition as named tuples (as obtained via df.itertuples,
+            with the index value as field 'Index') instead of Series. Named tuples are much cheaper to create than Series and
+            should be preferred for large data frames.
         """
         self.condition = condition
+        self.namedTuples = namedTuples
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.namedTuples:
+            return df.iloc[np.fromiter(map(self.condition, df.itertuples()), dtype=bool, count=len(df))]
         return df[df.apply(self.condition, axis=1)]
 
 
@@ -162,14 +237,58 @@ class DFTModifyColumn(RuleBasedDataFrameTransformer):
 
 
 class DFTModifyColumnVectorized(DFTModifyColumn):
-
+    """
+    Modifies a column specified by 'column' by applying 'columnTransform' to the entire column's numpy array at once.
+    Since the function operates on a plain numpy array, it may be a compiled function (e.g. created with numba.njit or
+    numba.vectorize), which avoids interpreter overhead for element-wise computations.
+    """
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
         df[self.column] = self.columnTransform(df[self.column].values)
         return df
 
+    def chain(self, other: "DFTModifyColumnVectorized") -> "DFTModifyColumnVectorized":
+        """
+        :param other: the modification of the same column to apply after this modification
+        :return: a transformer which is equivalent to applying this transformer followed by the other transformer
+        """
+        if other.column != self.column:
+            raise ValueError(f"Cannot chain modifications of different columns ('{self.column}', '{other.column}')")
+        return _DFTModifyColumnVectorizedChain(self.column, self._getColumnTransforms() + other._getColumnTransforms())
+
+    def _getColumnTransforms(self) -> List[Callable]:
+        return [self.columnTransform]
+
+
+class _DFTModifyColumnVectorizedChain(DFTModifyColumnVectorized):
+    """
+    Applies a sequence of vectorized column transforms to the same column in succession, each receiving the array its
+    predecessor's result would yield if it were written to the column; only the final result is written to the data frame
+    """
+    def __init__(self, column: str, columnTransforms: List[Callable]):
+        self.column = column
+        self.columnTransforms = columnTransforms
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        values = df[self.column].values
+        for i, columnTransform in enumerate(self.columnTransforms):
+            if i > 0 and not (isinstance(values, np.ndarray) and values.ndim == 1 and len(values) == len(df)
+                    and values.dtype.kind in "biufc"):
+                # let pandas convert the intermediate result as it does when assigning it to the column (broadcasting scalars,
+                # aligning series on the index, converting strings to objects, retaining categoricals, etc.)
+                columnDf = pd.DataFrame(index=df.index)
+                columnDf[self.column] = values
+                values = columnDf[self.column].values
+            values = columnTransform(values)
+        df[self.column] = values
+        return df
+
+    def _getColumnTransforms(self) -> List[Callable]:
+        return list(self.columnTransforms)
+
 
 class DFTOneHotEncoder(DataFrameTransformer):
-    def __init__(self, columns: Optional[Union[str, Sequence[str]]], categories: Union[List[np.ndarray], Dict[str, np.ndarray]] = None, inplace=False, ignoreUnknown=False):
+    def __init__(self, columns: Optional[Union[str, Sequence[str]]], categories: Union[List[np.ndarray], Dict[str, np.ndarray]] = None, inplace=False, ignoreUnknown=False,
+            sparse=False, dtype=np.uint8):
         """
         One hot encode categorical variables
 
@@ -180,8 +299,16 @@ class DFTOneHotEncoder(DataFrameTransformer):
             If None, the possible values will be inferred from the columns
         :param ignoreUnknown: if True and an unknown category is encountered during transform, the resulting one-hot
             encoded columns for this feature will be all zeros. if False, an unknown category will raise an error.
+        :param sparse: if True, the one-hot encoded columns will be sparse columns (pandas.arrays.SparseArray), which
+            saves memory for columns with many categories; the columns are created directly from the encoder's sparse matrix,
+            i.e. the dense representation is never materialised. Dense values can be obtained on demand via the columns' sparse
+            accessor (e.g. df[col].sparse.to_dense()). If False, regular dense columns are created.
+        :param dtype: the data type of the one-hot encoded columns; the default (np.uint8) requires one eighth of the memory required
+            by float64 columns; use np.bool_ for boolean columns
         """
-        self.oneHotEncoders = None
+        self.oneHotEncoder = None
+        self._categories: Optional[Dict[str, np.ndarray]] = None
+        self._encodedColumnNames: Optional[List[str]] = None
         if columns is None:
             self._columnsToEncode = []
             self._columnNameRegex = "$"
@@ -193,36 +320,48 @@ class DFTOneHotEncoder(DataFrameTransformer):
             self._columnsToEncode = columns
         self.inplace = inplace
         self.handleUnknown = "ignore" if ignoreUnknown else "error"
+        self.sparse = sparse
+        self.dtype = dtype
         if categories is not None:
             if type(categories) == dict:
-                self.oneHotEncoders = {col: OneHotEncoder(categories=[np.sort(categories)], sparse=False, handle_unknown=self.handleUnknown) for col, categories in categories.items()}
+                self._categories = {col: np.sort(categories) for col, categories in categories.items()}
             else:
                 if len(columns) != len(categories):
                     raise ValueError(f"Given categories must have the same length as columns to process")
-                self.oneHotEncoders = {col: OneHotEncoder(categories=[np.sort(categories)], sparse=False, handle_unknown=self.handleUnknown) for col, categories in zip(columns, categories)}
+                self._categories = {col: np.sort(categories) for col, categories in zip(columns, categories)}
 
     def fit(self, df: pd.DataFrame):
         if self._columnsToEncode is None:
-            self._columnsToEncode = [c for c in df.columns if re.fullmatch(self._columnNameRegex, c) is not None]
+            columnNameRegex = re.compile(self._columnNameRegex)
+            self._columnsToEncode = [c for c in df.columns if columnNameRegex.fullmatch(c) is not None]
             if len(self._columnsToEncode) == 0:
                 log.warning(f"{self} does not apply to any columns, transformer has no effect; regex='{self._columnNameRegex}'")
-        if self.oneHotEncoders is None:
-            self.oneHotEncoders = {column: OneHotEncoder(categories=[np.sort(df[column].unique())], sparse=False, handle_unknown=self.handleUnknown) for column in self._columnsToEncode}
-        for columnName in self._columnsToEncode:
-            self.oneHotEncoders[columnName].fit(df[[columnName]])
+        if self._categories is None:
+            self._categories = {column: np.sort(df[column].unique()) for column in self._columnsToEncode}
+            # the categories were inferred from the data itself, so there are no unknown values to detect and fitting on the
+            # full columns would just needlessly process all their values again; a single data point suffices
+            fitDF = df.iloc[:1]
+        else:
+            fitDF = df
+        # a single encoder processes all columns at once (avoiding repeated input validation and data frame slicing)
+        self.oneHotEncoder = OneHotEncoder(categories=[self._categories[column] for column in self._columnsToEncode],
+            sparse=self.sparse, dtype=self.dtype, handle_unknown=self.handleUnknown)
+        self.oneHotEncoder.fit(fitDF[self._columnsToEncode])
+        self._encodedColumnNames = [f"{columnName}_{i}" for columnName, categories in zip(self._columnsToEncode, self.oneHotEncoder.categories_)
+            for i in range(len(categories))]
 
     def apply(self, df: pd.DataFrame):
         if len(self._columnsToEncode) == 0:
             return df
 
-        if not self.inplace:
-            df = df.copy()
-        for columnName in self._columnsToEncode:
-            encodedArray = self.oneHotEncoders[columnName].transform(df[[columnName]])
-            df = df.drop(columns=columnName)
-            for i in range(encodedArray.shape[1]):
-                df["%s_%d" % (columnName, i)] = encodedArray[:, i]
-        return df
+        # encode all columns at once and attach the encoded columns in a single data frame (rather than inserting them one by one);
+        # since the concatenation produces a new data frame, no copy of the input data frame is required
+        encodedArray = self.oneHotEncoder.transform(df[self._columnsToEncode])
+        if self.sparse:
+            encodedDF = pd.DataFrame.sparse.from_spmatrix(encodedArray, index=df.index, columns=self._encodedColumnNames)
+        else:
+            encodedDF = pd.DataFrame(encodedArray, index=df.index, columns=self._encodedColumnNames, copy=False)
+        return pd.concat([df.drop(columns=self._columnsToEncode), encodedDF], axis=1, copy=False)
 
 
 class DFTColumnFilter(RuleBasedDataFrameTransformer):
@@ -235,17 +374,26 @@ class DFTColumnFilter(RuleBasedDataFrameTransformer):
         self.drop = drop
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        if self.keep is not None:
+        # NOTE: no initial copy is required, because both column selection and dropping produce new data frames
+        if self.keep is not None and not self._keepsAllColumns(df):
             df = df[self.keep]
         if self.drop is not None:
             df = df.drop(columns=self.drop)
         return df
 
+    def _keepsAllColumns(self, df: pd.DataFrame) -> bool:
+        """
+        :return: True if the columns to keep are exactly the data frame's columns (in the same order), such that the selection
+            would have no effect
+        """
+        return len(self.keep) == len(df.columns) and all(df.columns == self.keep)
+
 
 class DFTKeepColumns(DFTColumnFilter):
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self._keepsAllColumns(df):
+            return df
         return df[self.keep]
 
 
@@ -253,13 +401,24 @@ class DFTDRowFilterOnIndex(RuleBasedDataFrameTransformer):
     def __init__(self, keep: Set = None, drop: Set = None):
         self.drop = drop
         self.keep = keep
+        # the labels are converted to arrays once rather than upon every application
+        self._keepLabels = _toValueArray(keep) if keep is not None else None
+        self._dropLabels = _toValueArray(drop) if drop is not None else None
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        if self.keep is not None:
-            df = df.loc[self.keep]
-        if self.drop is not None:
-            df = df.drop(self.drop)
+        # NOTE: no initial copy is required, because both row selection and dropping produce new data frames
+        if self._keepLabels is not None:
+            if df.index.is_unique:
+                # selecting rows by their integer positions is faster than label-based selection
+                positions = df.index.get_indexer(self._keepLabels)
+                isMissing = positions == -1
+                if np.any(isMissing):
+                    raise KeyError(f"Labels to keep not contained in index: {list(self._keepLabels[isMissing])}")
+                df = df.take(positions)
+            else:
+                df = df.loc[self._keepLabels]
+        if self._dropLabels is not None:
+            df = df.drop(self._dropLabels)
         return df
 
 
@@ -316,10 +475,43 @@ class DFTNormalisation(DataFrameTransformer):
         def setRegex(self, regex: str):
             self.regex = re.compile(regex)
 
-        def matches(self, column: str):
+        def _getRegex(self) -> Pattern:
             if self.regex is None:
                 raise Exception("Attempted to apply a placeholder rule. Perhaps the feature generator from which the rule originated was never applied in order to have the rule instantiated.")
-            return self.regex.fullmatch(column) is not None
+            return self.regex
+
+        def matches(self, column: str):
+            return self._getRegex().fullmatch(column) is not None
+
+        def _getLiterals(self) -> Optional[FrozenSet[str]]:
+            """
+            :return: the set of column names matched by the rule's regex if the regex is of the form (<literal1>|...|<literalN>),
+                where special characters within the literals are escaped (as in regexes created by orRegexGroup); None otherwise
+            """
+            regex = self._getRegex()
+            pattern = regex.pattern
+            if regex.flags != re.compile("").flags or not (pattern.startswith("(") and pattern.endswith(")")):
+                return None
+            # split the group's content at unescaped alternation characters
+            alternatives = []
+            current = []
+            chars = iter(pattern[1:-1])
+            for c in chars:
+                if c == "\\":
+                    current.append(c + next(chars, ""))
+                elif c == "|":
+                    alternatives.append("".join(current))
+                    current = []
+                else:
+                    current.append(c)
+            alternatives.append("".join(current))
+            literals = set()
+            for alternative in alternatives:
+                literal = re.sub(r"\\(.)", r"\1", alternative, flags=re.DOTALL)
+                if re.escape(literal) != alternative:
+                    return None
+                literals.add(literal)
+            return frozenset(literals)
 
         def matchingColumns(self, columns: Sequence[str]):
             return [col for col in columns if self.matches(col)]
@@ -327,7 +519,8 @@ class DFTNormalisation(DataFrameTransformer):
         def __str__(self):
             return f"{self.__class__.__name__}[regex='{self.regex.pattern}', unsupported={self.unsupported}, skip={self.skip}, transformer={self.transformer}]"
 
-    def __init__(self, rules: Sequence[Rule], defaultTransformerFactory=None, requireAllHandled=True, inplace=False):
+    def __init__(self, rules: Sequence[Rule], defaultTransformerFactory=None, requireAllHandled=True, inplace=False, numThreads=1,
+            dtype=None):
         """
         :param rules: the set of rules to apply
         :param defaultTransformerFactory: a factory for the creation of transformer instances (from sklearn.preprocessing, e.g. StandardScaler)
@@ -336,23 +529,86 @@ class DFTNormalisation(DataFrameTransformer):
             not be transformed.
         :param requireAllHandled: whether to raise an exception if not all columns are matched by a rule
         :param inplace: whether to apply data frame transformations in-place
+        :param numThreads: the number of threads with which to apply the rules' transformers concurrently (use 1 to apply them
+            sequentially). Since the rules apply to disjoint sets of columns, using multiple threads can speed up the application
+            for data frames with many rules and rows (as the transformations are carried out by numpy, releasing the GIL).
+        :param dtype: the dtype to which the transformed values shall be converted (e.g. np.float32 in order to halve the memory
+            required by the normalised columns at the expense of precision); if None, use the dtype produced by the transformers
+            (usually float64)
         """
         self.requireAllHandled = requireAllHandled
         self.inplace = inplace
+        self.numThreads = numThreads
+        self.dtype = dtype
         self._userRules = rules
         self._defaultTransformerFactory = defaultTransformerFactory
-        self._rules = None
+        self._rules: Optional[List[Tuple[DFTNormalisation.Rule, List[str]]]] = None
+
+    @staticmethod
+    def _matchColumnsToRules(rules: Sequence[Rule], columns: Sequence[str]) -> List[List[str]]:
+        """
+        Determines the columns each of the given rules applies to, raising an exception if more than one rule applies to a column
+
+        :param rules: the rules
+        :param columns: the column names
+        :return: a list containing, for each rule, the list of columns it applies to
+        """
+        columnsPerRule = [[] for _ in rules]
+        if len(rules) == 0:
+            return columnsPerRule
+
+        # Rules whose regexes are alternations of literal column names (as created by orRegexGroup) are resolved via dictionary
+        # lookups; only the remaining rules require regex matching
+        literalRuleIndices: Dict[str, List[int]] = {}
+        regexRuleIndices = []
+        for i, rule in enumerate(rules):
+            literals = rule._getLiterals()
+            if literals is None:
+                regexRuleIndices.append(i)
+            else:
+                for literal in literals:
+                    literalRuleIndices.setdefault(literal, []).append(i)
+        patterns = [rules[i]._getRegex().pattern for i in regexRuleIndices]
+
+        # Combine the rules' regexes into a single alternation with a named group per rule, such that a single match determines
+        # the first rule matching a column. The same alternation in reverse order determines the last matching rule;
+        # if the two differ, more than one rule applies to the column.
+        # Patterns with numbered back-references or conditionals cannot be combined, because the group numbers would change.
+        # Patterns with flags cannot be combined either, because global flags (e.g. "(?i)") would apply to all alternatives.
+        combinedRegexes = None
+        defaultFlags = re.compile("").flags
+        if len(patterns) > 0 and not any(re.search(r"\\[1-9]|\(\?\(|\(\?[aiLmsux]+\)", p) for p in patterns) \
+                and all(rules[i]._getRegex().flags == defaultFlags for i in regexRuleIndices):
+            alternatives = [f"(?P<_rule{i}>{p})" for i, p in zip(regexRuleIndices, patterns)]
+            try:
+                combinedRegexes = (re.compile("|".join(alternatives)), re.compile("|".join(reversed(alternatives))))
+            except re.error:
+                pass
+
+        for column in columns:
+            matchingRuleIndices = list(literalRuleIndices.get(column, ()))
+            if combinedRegexes is not None:
+                match = combinedRegexes[0].fullmatch(column)
+                if match is not None:
+                    firstRuleIndex = int(match.lastgroup[len("_rule"):])
+                    lastRuleIndex = int(combinedRegexes[1].fullmatch(column).lastgroup[len("_rule"):])
+                    matchingRuleIndices.append(firstRuleIndex)
+                    if lastRuleIndex != firstRuleIndex:
+                        matchingRuleIndices.append(lastRuleIndex)
+            else:
+                matchingRuleIndices.extend(i for i in regexRuleIndices if rules[i].matches(column))
+            if len(matchingRuleIndices) == 0:
+                continue
+            if len(matchingRuleIndices) > 1:
+                matchingRuleIndices.sort()
+                raise Exception(f"More than one rule applies to column '{column}': {rules[matchingRuleIndices[0]]}, {rules[matchingRuleIndices[1]]}")
+            columnsPerRule[matchingRuleIndices[0]].append(column)
+        return columnsPerRule
 
     def fit(self, df: pd.DataFrame):
-        matchedRulesByColumn = {}
         self._rules = []
-        for rule in self._userRules:
-            matchingColumns = rule.matchingColumns(df.columns)
-            for c in matchingColumns:
-                if c in matchedRulesByColumn:
-                    raise Exception(f"More than one rule applies to column '{c}': {matchedRulesByColumn[c]}, {rule}")
-                matchedRulesByColumn[c] = rule
-
+        columnsPerRule = self._matchColumnsToRules(self._userRules, df.columns)
+        for rule, matchingColumns in zip(self._userRules, columnsPerRule):
             # fit transformer
             if len(matchingColumns) > 0:
                 if rule.unsupported:
@@ -362,20 +618,17 @@ class DFTNormalisation(DataFrameTransformer):
                         if self._defaultTransformerFactory is None:
                             raise Exception(f"No transformer to fit: {rule} defines no transformer and instance has no transformer factory")
                         rule.transformer = self._defaultTransformerFactory()
-                    applicableDF = df[matchingColumns]
-                    flatValues = applicableDF.values.flatten()
-                    rule.transformer.fit(flatValues.reshape((len(flatValues), 1)))
+                    # the columns were determined in a single pass above, so we can directly fit on their values
+                    # (reshaping rather than flattening, which needlessly creates a further copy); for a single column,
+                    # we directly use the column's array, avoiding the creation of an intermediate data frame
+                    values = df[matchingColumns[0] if len(matchingColumns) == 1 else matchingColumns].to_numpy(copy=False)
+                    rule.transformer.fit(values.reshape((values.size, 1)))
             else:
                 log.log(logging.DEBUG - 1, f"{rule} matched no columns")
 
-            # collect specialised rule for application
-            specialisedRule = copy.copy(rule)
-            r = orRegexGroup(matchingColumns)
-            try:
-                specialisedRule.regex = re.compile(r)
-            except Exception as e:
-                raise Exception(f"Could not compile regex '{r}': {e}")
-            self._rules.append(specialisedRule)
+            # collect the rule along with the columns it applies to for application (the columns being stored explicitly,
+            # there is no need to specialise the rule's regex to the columns)
+            self._rules.append((rule, matchingColumns))
 
     def _checkUnhandledColumns(self, df, matchedRulesByColumn):
         if self.requireAllHandled:
@@ -387,26 +640,95 @@ class DFTNormalisation(DataFrameTransformer):
         if not self.inplace:
             df = df.copy()
         matchedRulesByColumn = {}
-        for rule in self._rules:
-            for c in rule.matchingColumns(df.columns):
+        transformations = []
+        # the columns each rule applies to were determined during fit, so we only need to check which of them are present
+        availableColumns = set(df.columns)
+        for rule, ruleColumns in self._rules:
+            matchingColumns = [c for c in ruleColumns if c in availableColumns]
+            for c in matchingColumns:
                 matchedRulesByColumn[c] = rule
-                if not rule.skip:
-                    df[c] = rule.transformer.transform(df[[c]].values)
+            if not rule.skip and len(matchingColumns) > 0:
+                # the transformer was fitted on the flattened values of all matching columns, so we can transform all columns at once;
+                # for a single column, we directly use the column's array, avoiding the creation of an intermediate data frame
+                columns = matchingColumns[0] if len(matchingColumns) == 1 else matchingColumns
+                transformations.append((rule.transformer, columns))
+
+        def transform(transformation):
+            transformer, columns = transformation
+            values = self._transform(transformer, df[columns].to_numpy(copy=False))
+            if self.dtype is not None:
+                values = values.astype(self.dtype, copy=False)
+            return values
+
+        if self.numThreads == 1 or len(transformations) <= 1:
+            for transformation in transformations:
+                df[transformation[1]] = transform(transformation)
+        else:
+            # the transformations are computed concurrently, but the data frame is modified in the main thread only
+            with ThreadPoolExecutor(max_workers=self.numThreads) as executor:
+                transformedValues = list(executor.map(transform, transformations))
+            for (_, columns), values in zip(transformations, transformedValues):
+                df[columns] = values
         self._checkUnhandledColumns(df, matchedRulesByColumn)
         return df
 
+    @staticmethod
+    def _transform(transformer, values: np.ndarray) -> np.ndarray:
+        """
+        Applies the given (single-feature) transformer to all the given values
+
+        :param transformer: the fitted transformer
+        :param values: an array of arbitrary shape containing the values to transform
+        :return: an array of the same shape containing the transformed values
+        """
+        # for the common elementwise affine scalers, we directly evaluate the scaling formula with numpy,
+        # avoiding the comparatively large overhead of the generic sklearn transform call (input validation, etc.)
+        if type(transformer) == StandardScaler or (type(transformer) == MinMaxScaler and not getattr(transformer, "clip", False)):
+            if values.dtype.kind != "f":
+                values = values.astype(np.float64)
+            # only the first operation creates a new array; subsequent operations are applied to it in place
+            if type(transformer) == StandardScaler:
+                if transformer.with_mean:
+                    values = values - transformer.mean_[0]
+                    if transformer.with_std:
+                        values /= transformer.scale_[0]
+                elif transformer.with_std:
+                    values = values / transformer.scale_[0]
+                return values
+            else:
+                values = values * transformer.scale_[0]
+                values += transformer.min_[0]
+                return values
+        return transformer.transform(values.reshape((values.size, 1))).reshape(values.shape)
+
 
 class DFTFromColumnGenerators(RuleBasedDataFrameTransformer):
-    def __init__(self, columnGenerators: Sequence[ColumnGenerator], inplace=False):
+    def __init__(self, columnGenerators: Sequence[ColumnGenerator], inplace=False, numThreads=1):
+        """
+        :param columnGenerators: the column generators, which are applied in the given order, each generator receiving the data frame
+            extended by the columns of its predecessors
+        :param inplace: whether to add the generated columns to the given data frame (in-place)
+        :param numThreads: the number of threads with which to apply the column generators concurrently (use 1 to apply them
+            sequentially). When using multiple threads, all generators receive the original data frame, i.e. the generators must
+            not depend on each other's columns.
+        """
         self.columnGenerators = columnGenerators
         self.inplace = inplace
+        self.numThreads = numThreads
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
         if not self.inplace:
             df = df.copy()
-        for cg in self.columnGenerators:
-            series = cg.generateColumn(df)
-            df[series.name] = series
+        if self.numThreads == 1 or len(self.columnGenerators) <= 1:
+            for cg in self.columnGenerators:
+                series = cg.generateColumn(df)
+                df[series.name] = series
+        else:
+            # the columns are generated concurrently, but the data frame is modified in the main thread only
+            with ThreadPoolExecutor(max_workers=self.numThreads) as executor:
+                seriesList = list(executor.map(lambda cg: cg.generateColumn(df), self.columnGenerators))
+            for series in seriesList:
+                df[series.name] = series
         return df
 
 
@@ -416,8 +738,12 @@ class DFTCountEntries(RuleBasedDataFrameTransformer):
         self.columnForEntryCount = columnForEntryCount
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        series = df[self.columnForEntryCount].value_counts()
-        return pd.DataFrame({self.columnForEntryCount: series.index, self.columnNameForResultingCounts: series.values})
+        series = df[self.columnForEntryCount]
+        counts = series.value_counts()
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # only count observed categories (value_counts includes unused categories with zero counts)
+            counts = counts[counts.values > 0]
+        return pd.DataFrame({self.columnForEntryCount: counts.index, self.columnNameForResultingCounts: counts.values})
 
 
 class DFTAggregationOnColumn(RuleBasedDataFrameTransformer):
@@ -432,7 +758,11 @@ class DFTAggregationOnColumn(RuleBasedDataFrameTransformer):
 class DFTRoundFloats(RuleBasedDataFrameTransformer):
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
-        return pd.DataFrame(np.round(df.values), columns=df.columns, index=df.index)
+        values = df.values
+        # for floating point values, the ufunc rint is equivalent to round (rounding half to even) but avoids its overhead;
+        # since the rounded array is a new array, the resulting data frame need not copy it
+        roundedValues = np.rint(values) if values.dtype.kind == "f" else np.round(values)
+        return pd.DataFrame(roundedValues, columns=df.columns, index=df.index, copy=False)
 
 
 class DFTSkLearnTransformer(InvertibleDataFrameTransformer):
@@ -449,22 +779,34 @@ class DFTSkLearnTransformer(InvertibleDataFrameTransformer):
         self.columns = columns
         self.inplace = inplace
 
+    def _getValues(self, df: pd.DataFrame, copy=False) -> np.ndarray:
+        """
+        :param df: the data frame
+        :param copy: whether the returned array must not share memory with the data frame (if False, the values of all
+            columns may be returned as a view of the data frame's data)
+        :return: the values of the columns to transform
+        """
+        # if all columns are to be transformed, we use the data frame's array directly, because selecting all columns would
+        # first create a copy of the data frame (and, for a data frame consisting of a single block, the array is a view)
+        if self.columns is None:
+            return df.to_numpy(copy=copy)
+        return df[self.columns].to_numpy(copy=False)  # the column selection already created a new data frame
+
     def fit(self, df: pd.DataFrame):
-        cols = self.columns
-        if cols is None:
-            cols = df.columns
-        self.sklearnTransformer.fit(df[cols].values)
+        self.sklearnTransformer.fit(self._getValues(df))
 
     def _apply(self, df: pd.DataFrame, inverse: bool) -> pd.DataFrame:
+        transform = self.sklearnTransformer.inverse_transform if inverse else self.sklearnTransformer.transform
+        # the values must not be a view of the input data frame if it shall remain unchanged, because sklearn transformers
+        # may transform their input in place (e.g. StandardScaler(copy=False)) and the result may then be the input itself
+        transformedValues = transform(self._getValues(df, copy=not self.inplace))
+        if self.columns is None and not self.inplace:
+            # all columns are transformed, so we can directly create the resulting data frame from the transformed values
+            # (instead of copying the data frame and then overwriting all of its columns)
+            return pd.DataFrame(transformedValues, index=df.index, columns=df.columns)
         if not self.inplace:
             df = df.copy()
-        cols = self.columns
-        if cols is None:
-            cols = df.columns
-        if inverse:
-            df[cols] = self.sklearnTransformer.inverse_transform(df[cols].values)
-        else:
-            df[cols] = self.sklearnTransformer.transform(df[cols].values)
+        df[df.columns if self.columns is None else self.columns] = transformedValues
         return df
 
     def apply(self, df):
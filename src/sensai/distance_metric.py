@@ -2,10 +2,11 @@ import logging
 import math
 import os
 from abc import abstractmethod, ABC
-from typing import Sequence, Tuple, List, Union
+from typing import Sequence, Tuple, List, Union, Iterator, Optional, Callable
 
 import numpy as np
 import pandas as pd
+import scipy.spatial.distance
 
 from .util import cache
 from .util.cache import DelayedUpdateHook
@@ -15,6 +16,150 @@ from .util.typing import PandasNamedTuple
 _log = logging.getLogger(__name__)
 
 
+class DataPoints(ABC):
+    """
+    Represents a sequence of data points (rows of a data frame) to which distances are to be computed, providing access
+    to the data points' named tuples as well as to the values of entire columns as numpy arrays (which enables vectorised
+    distance computations)
+    """
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def getNamedTuple(self, i: int) -> PandasNamedTuple:
+        """
+        :param i: the position of the data point within this sequence
+        :return: the named tuple representing the data point
+        """
+        pass
+
+    def iterNamedTuples(self) -> Iterator[PandasNamedTuple]:
+        for i in range(len(self)):
+            yield self.getNamedTuple(i)
+
+    @abstractmethod
+    def getColumnValues(self, column: str) -> np.ndarray:
+        """
+        :param column: the column name
+        :return: an array whose first dimension corresponds to the data points, containing the column's values;
+            if the column contains vectors (e.g. numpy arrays of the same length), the array is two-dimensional
+        """
+        pass
+
+    def getDerivedColumnValues(self, column: str, name: str, derive: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        Provides values derived from a column's values, which implementations may retain, such that the derivation is applied
+        only once (rather than upon every distance computation).
+
+        :param column: the column name
+        :param name: the name identifying the derivation (which, together with the column, serves as the key for retained values)
+        :param derive: the function which maps an array of column values (as returned by getColumnValues) to the derived array;
+            it must operate on each data point separately, i.e. the derived values of a subset must be the corresponding subset
+            of the derived values
+        :return: an array whose first dimension corresponds to the data points, containing the derived values
+        """
+        return derive(self.getColumnValues(column))
+
+    def subset(self, positions: Union[np.ndarray, slice]) -> "DataPoints":
+        """
+        :param positions: the positions of the data points to select; if a slice is given, column values are provided as views
+            (without copying any data)
+        :return: the sequence of the data points at the given positions
+        """
+        return DataPointsSubset(self, positions)
+
+
+class DataFrameDataPoints(DataPoints):
+    """
+    Represents the rows of a data frame as data points, lazily computing and retaining named tuples, column arrays and derived
+    column arrays
+    """
+    def __init__(self, df: pd.DataFrame, floatDtype=None):
+        """
+        :param df: the data frame whose rows are the data points
+        :param floatDtype: the dtype to which column arrays of floating point values shall be converted (e.g. np.float32 in order to
+            halve the memory required for large data sets at the expense of precision); if None, retain the data frame's dtypes
+        """
+        self.df = df
+        self.floatDtype = floatDtype
+        self._namedTuples = None
+        self._columnValues = {}
+        self._derivedColumnValues = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getstate__(self):
+        return {"df": self.df, "floatDtype": self.floatDtype, "_namedTuples": None, "_columnValues": {},
+            "_derivedColumnValues": {}}
+
+    def getNamedTuples(self) -> List[PandasNamedTuple]:
+        if self._namedTuples is None:
+            self._namedTuples = list(self.df.itertuples())
+        return self._namedTuples
+
+    def getNamedTuple(self, i: int) -> PandasNamedTuple:
+        return self.getNamedTuples()[i]
+
+    def iterNamedTuples(self) -> Iterator[PandasNamedTuple]:
+        return iter(self.getNamedTuples())
+
+    def getColumnValues(self, column: str) -> np.ndarray:
+        values = self._columnValues.get(column)
+        if values is None:
+            values = self.df[column].to_numpy()
+            if values.dtype == object and len(values) > 0 and isinstance(values[0], np.ndarray):
+                try:
+                    values = np.stack(values)
+                except ValueError:  # arrays of different shapes cannot be stacked
+                    pass
+            if self.floatDtype is not None and values.dtype.kind == "f":
+                values = values.astype(self.floatDtype, copy=False)
+            self._columnValues[column] = values
+        return values
+
+    def getDerivedColumnValues(self, column: str, name: str, derive: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        key = (column, name)
+        values = self._derivedColumnValues.get(key)
+        if values is None:
+            values = derive(self.getColumnValues(column))
+            self._derivedColumnValues[key] = values
+        return values
+
+
+class DataPointsSubset(DataPoints):
+    def __init__(self, dataPoints: DataPoints, positions: Union[np.ndarray, slice, range]):
+        """
+        :param dataPoints: the data points from which to select
+        :param positions: the positions of the data points to select (where a slice is equivalent to the corresponding range)
+        """
+        self.dataPoints = dataPoints
+        self.positions = range(len(dataPoints))[positions] if isinstance(positions, slice) else positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def getNamedTuple(self, i: int) -> PandasNamedTuple:
+        return self.dataPoints.getNamedTuple(self.positions[i])
+
+    def _select(self, values: np.ndarray) -> np.ndarray:
+        if isinstance(self.positions, range):
+            return values[self.positions.start:self.positions.stop:self.positions.step]
+        return values[self.positions]
+
+    def getColumnValues(self, column: str) -> np.ndarray:
+        return self._select(self.dataPoints.getColumnValues(column))
+
+    def getDerivedColumnValues(self, column: str, name: str, derive: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        return self._select(self.dataPoints.getDerivedColumnValues(column, name, derive))
+
+    def subset(self, positions: Union[np.ndarray, slice]) -> DataPoints:
+        if isinstance(self.positions, range) and isinstance(positions, slice):
+            return DataPointsSubset(self.dataPoints, self.positions[positions])
+        return DataPointsSubset(self.dataPoints, np.asarray(self.positions)[positions])
+
+
 class DistanceMetric(ABC):
     """
     Abstract base class for (symmetric) distance metrics
@@ -23,6 +168,49 @@ class DistanceMetric(ABC):
     def distance(self, namedTupleA: PandasNamedTuple, namedTupleB: PandasNamedTuple) -> float:
         pass
 
+    def distances(self, namedTupleA: PandasNamedTuple, dataPoints: DataPoints, threshold: Optional[float] = None) -> np.ndarray:
+        """
+        Computes the distances between a data point and each data point in a sequence of data points.
+        Subclasses should override this method if the computation can be vectorised.
+
+        :param namedTupleA: the data point
+        :param dataPoints: the sequence of data points
+        :param threshold: if not None, distances greater than this threshold are irrelevant to the caller, and implementations
+            may abort their computation early, returning an arbitrary value greater than the threshold instead
+        :return: an array containing the distances to the data points (in the order of the sequence)
+        """
+        return np.fromiter((self.distance(namedTupleA, namedTupleB) for namedTupleB in dataPoints.iterNamedTuples()), dtype=float,
+            count=len(dataPoints))
+
+    def distanceMatrix(self, dataPointsA: DataPoints, dataPointsB: DataPoints) -> Optional[np.ndarray]:
+        """
+        Computes the distances between all pairs of data points from two sequences of data points in a single (vectorised)
+        operation, if the metric supports it.
+
+        :param dataPointsA: the first sequence of data points
+        :param dataPointsB: the second sequence of data points
+        :return: the matrix of distances, where the entry (i, j) is the distance between the i-th data point in dataPointsA and
+            the j-th data point in dataPointsB, or None if the metric does not support the vectorised computation (in which case
+            distances should be used)
+        """
+        return None
+
+    def satisfiesTriangleInequality(self) -> bool:
+        """
+        :return: whether the metric is known to satisfy the triangle inequality, i.e. d(a, c) <= d(a, b) + d(b, c) for all a, b, c,
+            which enables the pruning of distance computations in nearest neighbor searches
+        """
+        return False
+
+    def getCacheKey(self) -> tuple:
+        """
+        :return: a hashable key which identifies the metric, i.e. two metrics with the same key must compute the same distances.
+            The default implementation uses the metric's string representation; subclasses should override this method in order
+            to return a cheaper key (e.g. a tuple of the metric's class and its parameters), and subclasses of classes which
+            do so must override it if they add parameters.
+        """
+        return self.__class__, str(self)
+
     @abstractmethod
     def __str__(self):
         super().__str__()
@@ -36,10 +224,66 @@ class SingleColumnDistanceMetric(DistanceMetric, ABC):
     def _distance(self, valueA, valueB) -> float:
         pass
 
+    def _distances(self, valueA, valuesB: np.ndarray) -> np.ndarray:
+        """
+        Computes the distances between a value and each of the given values.
+        Subclasses should override this method if the computation can be vectorised.
+
+        :param valueA: the value
+        :param valuesB: an array whose first dimension corresponds to the values to compute distances to
+        :return: an array of distances
+        """
+        return np.fromiter((self._distance(valueA, valueB) for valueB in valuesB), dtype=float, count=len(valuesB))
+
     def distance(self, namedTupleA: PandasNamedTuple, namedTupleB: PandasNamedTuple):
         valueA, valueB = getattr(namedTupleA, self.column), getattr(namedTupleB, self.column)
         return self._distance(valueA, valueB)
 
+    def distances(self, namedTupleA: PandasNamedTuple, dataPoints: DataPoints, threshold: Optional[float] = None) -> np.ndarray:
+        return self._distances(getattr(namedTupleA, self.column), dataPoints.getColumnValues(self.column))
+
+    def _distanceMatrix(self, valuesA: np.ndarray, valuesB: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Computes the distances between all pairs of values from two arrays of values.
+        Subclasses should override this method if the computation can be vectorised.
+
+        :param valuesA: an array whose first dimension corresponds to the first sequence of values
+        :param valuesB: an array whose first dimension corresponds to the second sequence of values
+        :return: the matrix of distances or None if the vectorised computation is not supported
+        """
+        return None
+
+    def distanceMatrix(self, dataPointsA: DataPoints, dataPointsB: DataPoints) -> Optional[np.ndarray]:
+        return self._distanceMatrix(dataPointsA.getColumnValues(self.column), dataPointsB.getColumnValues(self.column))
+
+
+def _euclideanDistances(valueA: np.ndarray, valuesB: np.ndarray) -> np.ndarray:
+    """
+    :param valueA: a vector
+    :param valuesB: a two-dimensional array whose rows are vectors of the same length as valueA
+    :return: the Euclidean distances between valueA and each row of valuesB
+    """
+    if valuesB.dtype.kind == "f" and valuesB.dtype != np.float64:
+        # cdist would convert the entire array to float64, so compute the distances in the array's own (reduced) dtype
+        differences = valuesB - np.asarray(valueA, dtype=valuesB.dtype).reshape(-1)
+        return np.sqrt(np.einsum("ij,ij->i", differences, differences))
+    # scipy's compiled implementation avoids the creation of temporary arrays (of differences and squares)
+    return scipy.spatial.distance.cdist(np.reshape(valueA, (1, -1)), valuesB)[0]
+
+
+def _euclideanDistanceMatrix(valuesA: np.ndarray, valuesB: np.ndarray) -> np.ndarray:
+    """
+    :param valuesA: a two-dimensional array whose rows are vectors
+    :param valuesB: a two-dimensional array whose rows are vectors of the same length
+    :return: the matrix of Euclidean distances between the rows of valuesA and the rows of valuesB
+    """
+    if valuesB.dtype.kind == "f" and valuesB.dtype != np.float64:
+        result = np.empty((len(valuesA), len(valuesB)), dtype=valuesB.dtype)
+        for i, valueA in enumerate(valuesA):
+            result[i] = _euclideanDistances(valueA, valuesB)
+        return result
+    return scipy.spatial.distance.cdist(valuesA, valuesB)
+
 
 class DistanceMatrixDFCache(cache.PersistentKeyValueCache):
     def __init__(self, picklePath, saveOnUpdate=True, deferredSaveDelaySecs=1.0):
@@ -124,6 +368,12 @@ class CachedDistanceMetric(DistanceMetric, cache.CachedValueProviderMixin):
         valueA, valueB = data
         return self.metric.distance(valueA, valueB)
 
+    def getCacheKey(self) -> tuple:
+        return self.metric.getCacheKey()
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return self.metric.satisfiesTriangleInequality()
+
     def fillCache(self, dfIndexedById: pd.DataFrame):
         """
         Fill cache for all identifiers in the provided dataframe
@@ -156,6 +406,48 @@ class LinearCombinationDistanceMetric(DistanceMetric):
             value += metric.distance(namedTupleA, namedTupleB) * weight
         return value
 
+    def distances(self, namedTupleA, dataPoints: DataPoints, threshold: Optional[float] = None) -> np.ndarray:
+        if threshold is None or len(self.metrics) == 1 or any(weight <= 0 for weight, _ in self.metrics):
+            values = None
+            for weight, metric in self.metrics:
+                weightedDistances = metric.distances(namedTupleA, dataPoints, threshold=None) * weight
+                if values is None:
+                    values = weightedDistances
+                else:
+                    values += weightedDistances
+            return values
+
+        # Since all weights are positive, the partial sum of weighted distances is a lower bound for the total distance.
+        # Once a partial sum exceeds the threshold, no further component distances need to be computed for the data point.
+        values = np.zeros(len(dataPoints))
+        positions = np.arange(len(dataPoints))
+        for i, (weight, metric) in enumerate(self.metrics):
+            if i > 0:
+                positions = positions[values[positions] <= threshold]
+                if len(positions) == 0:
+                    break
+            relevantDataPoints = dataPoints if i == 0 else dataPoints.subset(positions)
+            values[positions] += metric.distances(namedTupleA, relevantDataPoints, threshold=threshold / weight) * weight
+        return values
+
+    def distanceMatrix(self, dataPointsA: DataPoints, dataPointsB: DataPoints) -> Optional[np.ndarray]:
+        values = None
+        for weight, metric in self.metrics:
+            distanceMatrix = metric.distanceMatrix(dataPointsA, dataPointsB)
+            if distanceMatrix is None:
+                return None
+            if values is None:
+                values = distanceMatrix * weight
+            else:
+                values += distanceMatrix * weight
+        return values
+
+    def getCacheKey(self) -> tuple:
+        return (self.__class__, *((weight, metric.getCacheKey()) for weight, metric in self.metrics))
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return all(weight > 0 and metric.satisfiesTriangleInequality() for weight, metric in self.metrics)
+
     def __str__(self):
         return f"Linear combination of {[(weight, str(metric)) for weight, metric in self.metrics]}"
 
@@ -167,6 +459,12 @@ class HellingerDistanceMetric(SingleColumnDistanceMetric):
         super().__init__(column)
         self.checkInput = checkInput
 
+    def getCacheKey(self) -> tuple:
+        return self.__class__, self.column
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return True
+
     def __str__(self):
         return objectRepr(self, ["column"])
 
@@ -187,6 +485,28 @@ class HellingerDistanceMetric(SingleColumnDistanceMetric):
 
         return np.linalg.norm(np.sqrt(valueA) - np.sqrt(valueB)) / self._SQRT2
 
+    @staticmethod
+    def _sqrtValues(values: np.ndarray) -> np.ndarray:
+        # only arrays of (stacked) vectors are supported by the vectorised computations; other arrays are retained as they are
+        return np.sqrt(values) if values.ndim == 2 else values
+
+    def distances(self, namedTupleA: PandasNamedTuple, dataPoints: DataPoints, threshold: Optional[float] = None) -> np.ndarray:
+        if self.checkInput:
+            return super().distances(namedTupleA, dataPoints, threshold=threshold)
+        sqrtValuesB = dataPoints.getDerivedColumnValues(self.column, "sqrt", self._sqrtValues)
+        if sqrtValuesB.ndim != 2:
+            return super().distances(namedTupleA, dataPoints, threshold=threshold)
+        return _euclideanDistances(np.sqrt(getattr(namedTupleA, self.column)), sqrtValuesB) / self._SQRT2
+
+    def distanceMatrix(self, dataPointsA: DataPoints, dataPointsB: DataPoints) -> Optional[np.ndarray]:
+        if self.checkInput:
+            return None
+        sqrtValuesA = dataPointsA.getDerivedColumnValues(self.column, "sqrt", self._sqrtValues)
+        sqrtValuesB = dataPointsB.getDerivedColumnValues(self.column, "sqrt", self._sqrtValues)
+        if sqrtValuesA.ndim != 2 or sqrtValuesB.ndim != 2:
+            return None
+        return _euclideanDistanceMatrix(sqrtValuesA, sqrtValuesB) / self._SQRT2
+
 
 class EuclideanDistanceMetric(SingleColumnDistanceMetric):
     def __init__(self, column: str):
@@ -195,6 +515,30 @@ class EuclideanDistanceMetric(SingleColumnDistanceMetric):
     def _distance(self, valueA, valueB):
         return np.linalg.norm(valueA - valueB)
 
+    def _distances(self, valueA, valuesB: np.ndarray) -> np.ndarray:
+        if valuesB.dtype == object:
+            return super()._distances(valueA, valuesB)
+        if valuesB.ndim == 2 and np.shape(valueA) == valuesB.shape[1:]:
+            return _euclideanDistances(valueA, valuesB)
+        differences = valuesB - valueA
+        if differences.ndim == 1:
+            return np.abs(differences)
+        return np.sqrt(np.sum(differences * differences, axis=tuple(range(1, differences.ndim))))
+
+    def _distanceMatrix(self, valuesA: np.ndarray, valuesB: np.ndarray) -> Optional[np.ndarray]:
+        if valuesA.dtype == object or valuesB.dtype == object:
+            return None
+        if valuesA.ndim == 1:
+            return np.abs(valuesA[:, np.newaxis] - valuesB[np.newaxis, :])
+        numDimensions = int(np.prod(valuesA.shape[1:]))
+        return _euclideanDistanceMatrix(valuesA.reshape((len(valuesA), numDimensions)), valuesB.reshape((len(valuesB), numDimensions)))
+
+    def getCacheKey(self) -> tuple:
+        return self.__class__, self.column
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return True
+
     def __str__(self):
         return objectRepr(self, ["column"])
 
@@ -212,6 +556,30 @@ class IdentityDistanceMetric(DistanceMetric):
                 return 1
         return 0
 
+    def distances(self, namedTupleA, dataPoints: DataPoints, threshold: Optional[float] = None) -> np.ndarray:
+        isDifferent = np.zeros(len(dataPoints), dtype=bool)
+        for key in self.keys:
+            valueA, valuesB = getattr(namedTupleA, key), dataPoints.getColumnValues(key)
+            if np.ndim(valueA) != 0 or valuesB.ndim != 1:  # element-wise comparison is only applicable to scalars
+                return super().distances(namedTupleA, dataPoints)
+            isDifferent |= valuesB != valueA
+        return isDifferent.astype(float)
+
+    def distanceMatrix(self, dataPointsA: DataPoints, dataPointsB: DataPoints) -> Optional[np.ndarray]:
+        isDifferent = np.zeros((len(dataPointsA), len(dataPointsB)), dtype=bool)
+        for key in self.keys:
+            valuesA, valuesB = dataPointsA.getColumnValues(key), dataPointsB.getColumnValues(key)
+            if valuesA.ndim != 1 or valuesB.ndim != 1 or (len(valuesA) > 0 and np.ndim(valuesA[0]) != 0):
+                return None  # element-wise comparison is only applicable to scalars
+            isDifferent |= valuesA[:, np.newaxis] != valuesB[np.newaxis, :]
+        return isDifferent.astype(float)
+
+    def getCacheKey(self) -> tuple:
+        return (self.__class__, *self.keys)
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return True
+
     def __str__(self):
         return f"{self.__class__.__name__} based on keys: {self.keys}"
 
@@ -241,5 +609,19 @@ class RelativeBitwiseEqualityDistanceMetric(SingleColumnDistanceMetric):
         else:
             return 1-np.dot(valueA, valueB)/denom
 
+    def _distances(self, valueA, valuesB: np.ndarray) -> np.ndarray:
+        if self.checkInput or valuesB.ndim != 2:
+            return super()._distances(valueA, valuesB)
+        denominators = np.count_nonzero(valuesB + valueA, axis=1)
+        distances = 1 - np.dot(valuesB, valueA) / np.maximum(denominators, 1)
+        distances[denominators == 0] = 0
+        return distances
+
+    def getCacheKey(self) -> tuple:
+        return self.__class__, self.column
+
+    def satisfiesTriangleInequality(self) -> bool:
+        return True
+
     def __str__(self):
         return f"{self.__class__.__name__} for column {self.column}"
@@ -1,6 +1,7 @@
 import logging
 import re
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Sequence, List, Union, Callable, Any, Dict, TYPE_CHECKING, Optional
 
 import numpy as np
@@ -200,11 +201,15 @@ class MultiFeatureGenerator(FeatureGenerator):
     Wrapper for multiple feature generators. Calling generate here applies all given feature generators independently and
     returns the concatenation of their outputs
     """
-    def __init__(self, featureGenerators: Sequence[FeatureGenerator]):
+    def __init__(self, featureGenerators: Sequence[FeatureGenerator], numThreads=1):
         """
         :param featureGenerators:
+        :param numThreads: the number of threads with which to apply the feature generators concurrently (use 1 to apply
+            them sequentially). Since the feature generators are independent, using multiple threads can speed up
+            feature generation for generators whose computations release the GIL (e.g. NumPy/pandas operations).
         """
         self.featureGenerators = featureGenerators
+        self.numThreads = numThreads
         categoricalFeatureNameRegexes = [regex for regex in [fg.getCategoricalFeatureNameRegex() for fg in featureGenerators] if regex is not None]
         if len(categoricalFeatureNameRegexes) > 0:
             categoricalFeatureNames = "|".join(categoricalFeatureNameRegexes)
@@ -215,14 +220,18 @@ class MultiFeatureGenerator(FeatureGenerator):
             addCategoricalDefaultRules=False)
 
     def _generateFromMultiple(self, generateFeatures: Callable[[FeatureGenerator], pd.DataFrame], index) -> pd.DataFrame:
-        dfs = []
-        for fg in self.featureGenerators:
-            df = generateFeatures(fg)
-            dfs.append(df)
+        if self.numThreads == 1 or len(self.featureGenerators) <= 1:
+            dfs = [generateFeatures(fg) for fg in self.featureGenerators]
+        else:
+            with ThreadPoolExecutor(max_workers=self.numThreads) as executor:
+                dfs = list(executor.map(generateFeatures, self.featureGenerators))
         if len(dfs) == 0:
             return pd.DataFrame(index=index)
+        elif len(dfs) == 1:
+            return dfs[0]
         else:
-            return pd.concat(dfs, axis=1)
+            # the frames were generated specifically for this call, so there is no need for concat to copy their data
+            return pd.concat(dfs, axis=1, copy=False)
 
     def _generate(self, inputDF: pd.DataFrame, ctx=None):
         def generateFeatures(fg: FeatureGenerator):
@@ -248,39 +257,98 @@ class MultiFeatureGenerator(FeatureGenerator):
 class FeatureGeneratorFromNamedTuples(FeatureGenerator, ABC):
     """
     Generates feature values for one data point at a time, creating a dictionary with
-    feature values from each named tuple
+    feature values from each named tuple.
+
+    Subclasses which always generate the same set of features may instead implement _getFeatureNames and
+    _generateFeatureValues, generating just the sequence of feature values for each data point, which avoids the creation
+    of a dictionary per data point and speeds up the construction of the resulting data frame.
+
+    Subclasses whose feature computation can be expressed in terms of entire columns may additionally
+    implement _generateVectorized, which is then used instead of the (much slower) generation of one
+    data point at a time whenever no cache is used.
     """
     def __init__(self, cache: util.cache.PersistentKeyValueCache = None, categoricalFeatureNames: Sequence[str] = (),
                  normalisationRules: Sequence[data_transformation.DFTNormalisation.Rule] = (),
                  normalisationRuleTemplate: data_transformation.DFTNormalisation.RuleTemplate = None):
+        cls = self.__class__
+        implementsDict = cls._generateFeatureDict is not FeatureGeneratorFromNamedTuples._generateFeatureDict
+        implementsValues = cls._getFeatureNames is not FeatureGeneratorFromNamedTuples._getFeatureNames and \
+            cls._generateFeatureValues is not FeatureGeneratorFromNamedTuples._generateFeatureValues
+        if not (implementsDict or implementsValues):
+            raise TypeError(f"Can't instantiate {cls.__name__}: it must implement either _generateFeatureDict or both _getFeatureNames "
+                f"and _generateFeatureValues")
         super().__init__(categoricalFeatureNames=categoricalFeatureNames, normalisationRules=normalisationRules, normalisationRuleTemplate=normalisationRuleTemplate)
         self.cache = cache
 
     def _generate(self, df: pd.DataFrame, ctx=None):
-        dicts = []
+        if self.cache is None:
+            resultDF = self._generateVectorized(df)
+            if resultDF is not None:
+                return resultDF
+        featureNames = self._getFeatureNames()
+        generateValue = self._generateFeatureDict if featureNames is None else self._generateFeatureValues
+        # retrieve cached values and store newly generated values in bulk (rather than accessing the cache for each data point)
+        cachedValues = self.cache.getMany(df.index) if self.cache is not None else {}
+        newValues = {}
+        values = []
         for idx, nt in enumerate(df.itertuples()):
             if idx % 100 == 0:
                 log.debug(f"Generating feature via {self.__class__.__name__} for index {idx}")
-            value = None
-            if self.cache is not None:
-                value = self.cache.get(nt.Index)
+            value = cachedValues.get(nt.Index)
             if value is None:
-                value = self._generateFeatureDict(nt)
+                value = generateValue(nt)
                 if self.cache is not None:
-                    self.cache.set(nt.Index, value)
-            dicts.append(value)
-        return pd.DataFrame(dicts, index=df.index)
+                    newValues[nt.Index] = value
+            values.append(value)
+        if len(newValues) > 0:
+            self.cache.setMany(newValues)
+        if featureNames is None:
+            return pd.DataFrame(values, index=df.index)
+        else:
+            return pd.DataFrame(values, index=df.index, columns=featureNames)
 
-    @abstractmethod
     def _generateFeatureDict(self, namedTuple) -> Dict[str, Any]:
         """
-        Creates a dictionary with feature values from a named tuple
+        Creates a dictionary with feature values from a named tuple.
+        Subclasses must implement this method unless they implement _getFeatureNames and _generateFeatureValues.
 
         :param namedTuple: the data point for which to generate features
         :return: a dictionary mapping feature names to values
         """
+        return dict(zip(self._getFeatureNames(), self._generateFeatureValues(namedTuple)))
+
+    def _getFeatureNames(self) -> Optional[Sequence[str]]:
+        """
+        This method may be overridden by subclasses which always generate the same features, in which case
+        _generateFeatureValues must also be implemented.
+        The default implementation returns None, indicating that features are generated as dictionaries via _generateFeatureDict.
+
+        :return: the names of the features in the order in which their values are returned by _generateFeatureValues or None
+        """
+        return None
+
+    def _generateFeatureValues(self, namedTuple) -> Sequence[Any]:
+        """
+        Creates the sequence of feature values for a named tuple; is only used if _getFeatureNames returns feature names.
+
+        :param namedTuple: the data point for which to generate features
+        :return: the feature values in the order given by _getFeatureNames
+        """
         pass
 
+    def _generateVectorized(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Generates the features for all data points in the given data frame at once, e.g. by applying NumPy operations
+        (or functions compiled with numba) to the columns' arrays (df[col].values).
+        This method may be overridden by subclasses; the default implementation returns None, indicating that features
+        are to be generated for one data point at a time via _generateFeatureDict.
+
+        :param df: the input data frame
+        :return: a data frame with the same index as df containing the same features _generateFeatureDict would generate
+            or None if vectorized generation is unsupported
+        """
+        return None
+
 
 class FeatureGeneratorTakeColumns(RuleBasedFeatureGenerator):
     def __init__(self, columns: Union[str, List[str]] = None, exceptColumns: Sequence[str] = (), categoricalFeatureNames: Sequence[str] = (),
@@ -336,7 +404,7 @@ class FeatureGeneratorFlattenColumns(RuleBasedFeatureGenerator):
         self.columns = columns
 
     def _generate(self, df: pd.DataFrame, ctx=None) -> pd.DataFrame:
-        resultDf = pd.DataFrame(index=df.index)
+        flattenedDfs = []
         columnsToFlatten = self.columns if self.columns is not None else df.columns
         for col in columnsToFlatten:
             log.debug(f"Flattening column {col}")
@@ -348,8 +416,11 @@ class FeatureGeneratorFlattenColumns(RuleBasedFeatureGenerator):
             dimension = values.shape[1]
             new_columns = [f"{col}_{i}" for i in range(dimension)]
             log.debug(f"Flattening resulted in {len(new_columns)} new columns")
-            resultDf[new_columns] = pd.DataFrame(values, index=df.index)
-        return resultDf
+            flattenedDfs.append(pd.DataFrame(values, index=df.index, columns=new_columns))
+        # NOTE: concatenating all flattened data frames at once is much faster than adding the columns to a result data frame one by one
+        if len(flattenedDfs) == 0:
+            return pd.DataFrame(index=df.index)
+        return pd.concat(flattenedDfs, axis=1)
 
 
 class FeatureGeneratorFromColumnGenerator(RuleBasedFeatureGenerator):
@@ -1,17 +1,18 @@
-import collections
 import typing
 
 import datetime
 import logging
 from abc import ABC, abstractmethod
-from typing import Callable, List, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Iterable, Optional, Tuple, Dict, Any
 
 import numpy as np
 import pandas as pd
+import scipy.spatial
 
 from . import distance_metric, util, data_transformation
 from .vector_model import VectorClassificationModel, VectorRegressionModel
-from .distance_metric import DistanceMetric
+from .distance_metric import DistanceMetric, DataPoints, DataFrameDataPoints, EuclideanDistanceMetric
 from .featuregen import FeatureGeneratorFromNamedTuples
 from .util.string import objectRepr
 from .util.typing import PandasNamedTuple
@@ -19,6 +20,29 @@ from .util.typing import PandasNamedTuple
 _log = logging.getLogger(__name__)
 
 
+def _nSmallestPositions(values: np.ndarray, n: int) -> np.ndarray:
+    """
+    Determines the positions of the n smallest values, sorted by value, where ties are resolved in favour of smaller positions
+    (i.e. the result corresponds to the first n positions of a stable sort).
+    Only the selected values are sorted, which is considerably faster than sorting all values if n is small.
+
+    :param values: the values
+    :param n: the number of positions to select
+    :return: the positions of the n smallest values
+    """
+    if n <= 0:
+        return np.zeros(0, dtype=int)
+    if n < len(values):
+        nthSmallestValue = np.partition(values, n - 1)[n - 1]
+        if np.isnan(nthSmallestValue):  # NaN values are sorted last
+            candidatePositions = np.arange(len(values))
+        else:
+            candidatePositions = np.flatnonzero(values <= nthSmallestValue)
+    else:
+        candidatePositions = np.arange(len(values))
+    return candidatePositions[np.argsort(values[candidatePositions], kind="stable")[:n]]
+
+
 class Neighbor:
     def __init__(self, value: PandasNamedTuple, distance: float):
         self.distance = distance
@@ -26,49 +50,113 @@ class Neighbor:
         self.identifier = value.Index
 
 
+def _selectNeighborPositions(distances: np.ndarray, n_neighbors: int, excludedPosition: Optional[int] = None) -> np.ndarray:
+    """
+    Selects the nearest neighbors among potential neighbors
+
+    :param distances: the distances to the potential neighbors
+    :param n_neighbors: the number of neighbors to select
+    :param excludedPosition: the position of a potential neighbor which shall not be selected (typically the data point itself)
+    :return: the positions of the nearest neighbors among the potential neighbors (sorted by distance)
+    """
+    if excludedPosition is None:
+        return _nSmallestPositions(distances, n_neighbors)
+    positions = _nSmallestPositions(distances, n_neighbors + 1)
+    return positions[positions != excludedPosition][:n_neighbors]
+
+
 class NeighborProvider(ABC):
-    def __init__(self, dfIndexedById: pd.DataFrame):
+    def __init__(self, dfIndexedById: pd.DataFrame, floatDtype=None):
+        """
+        :param dfIndexedById: the data frame containing the data points which are potential neighbors, indexed by identifier
+        :param floatDtype: the dtype to which the column arrays of floating point values used in distance computations shall be
+            converted (e.g. np.float32 in order to halve the memory footprint); if None, retain the data frame's dtypes.
+            See DataFrameDataPoints.
+        """
         self.df = dfIndexedById
         self.index = self.df.index
-        if any(self.index.duplicated()):
+        if not self.index.is_unique:
             raise Exception("Dataframe index should not contain duplicates")
-        self.indexPositionDict = {idx: pos for pos, idx in enumerate(self.index)}
+        self._indexPositionDict = None
+        self.dataPoints = DataFrameDataPoints(self.df, floatDtype=floatDtype)
+
+    @property
+    def indexPositionDict(self) -> Dict[Any, int]:
+        """
+        A dictionary mapping identifiers (index values) to positions within the data frame, which is created upon first access
+        """
+        if self._indexPositionDict is None:
+            self._indexPositionDict = {idx: pos for pos, idx in enumerate(self.index)}
+        return self._indexPositionDict
+
+    def getPositions(self, identifiers) -> np.ndarray:
+        """
+        :param identifiers: a sequence of identifiers (index values)
+        :return: the positions of the given identifiers within the data frame, where the position is -1 for identifiers that
+            are not contained
+        """
+        return self.index.get_indexer(identifiers)
 
     @abstractmethod
     def iterPotentialNeighbors(self, value: PandasNamedTuple) -> Iterable[PandasNamedTuple]:
         pass
 
+    def getPotentialNeighborPositions(self, value: PandasNamedTuple) -> np.ndarray:
+        """
+        :param value: the data point for which to determine potential neighbors
+        :return: the positions (within the data frame) of the potential neighbors of the given data point.
+            Subclasses should override this method to avoid the iteration over named tuples (via iterPotentialNeighbors).
+        """
+        return self.getPositions([nt.Index for nt in self.iterPotentialNeighbors(value)]).astype(int, copy=False)
+
+    def getPotentialNeighbors(self, value: PandasNamedTuple) -> DataPoints:
+        """
+        :param value: the data point for which to determine potential neighbors
+        :return: the potential neighbors of the given data point
+        """
+        return self.dataPoints.subset(self.getPotentialNeighborPositions(value))
+
+    def potentialNeighborsAreCommon(self) -> bool:
+        """
+        :return: True if all data points (i.e. self.dataPoints) are potential neighbors of every data point (except for the data
+            point itself, i.e. the data point with the same identifier, if any); False if the potential neighbors depend on the
+            data point
+        """
+        return False
+
     @abstractmethod
     def __str__(self):
         return super().__str__()
 
 
 class AllNeighborsProvider(NeighborProvider):
-    def __init__(self, dfIndexedById: pd.DataFrame):
-        super().__init__(dfIndexedById)
-        self.namedTuples = None
-
-    def __getstate__(self):
-        d = self.__dict__.copy()
-        d["namedTuples"] = None
-        return d
+    def __init__(self, dfIndexedById: pd.DataFrame, floatDtype=None):
+        super().__init__(dfIndexedById, floatDtype=floatDtype)
 
     def iterPotentialNeighbors(self, value):
         identifier = value.Index
-        if self.namedTuples is None:
-            self.namedTuples = list(self.df.itertuples())
-        for nt in self.namedTuples:
+        for nt in self.dataPoints.iterNamedTuples():
             if nt.Index != identifier:
                 yield nt
 
+    def getPotentialNeighborPositions(self, value: PandasNamedTuple) -> np.ndarray:
+        positions = np.arange(len(self.df))
+        position = self.indexPositionDict.get(value.Index)
+        if position is not None:
+            positions = np.delete(positions, position)
+        return positions
+
+    def potentialNeighborsAreCommon(self) -> bool:
+        return True
+
     def __str__(self):
         return str(self.__class__.__name__)
 
 
 class TimerangeNeighborsProvider(NeighborProvider):
     def __init__(self, dfIndexedById: pd.DataFrame, timestampsColumn="timestamps",
-                 pastTimeRangeDays=120, futureTimeRangeDays=120):
-        super().__init__(dfIndexedById)
+                 pastTimeRangeDays=120, futureTimeRangeDays=120, floatDtype=None):
+        super().__init__(dfIndexedById, floatDtype=floatDtype)
         if not pd.core.dtypes.common.is_datetime64_any_dtype(self.df[timestampsColumn]):
             raise Exception(f"Column {timestampsColumn} does not have a compatible datatype")
         self.timestampsColumn = timestampsColumn
@@ -76,27 +164,94 @@ class TimerangeNeighborsProvider(NeighborProvider):
         self.futureTimeRangeDays = futureTimeRangeDays
         self.pastTimeDelta = datetime.timedelta(days=pastTimeRangeDays)
         self.futureTimeDelta = datetime.timedelta(days=futureTimeRangeDays)
+        # sort the timestamps once, such that the potential neighbors in a time range can be found via binary search
+        self._timestamps = self.df[timestampsColumn].values
+        self._sortedPositions = np.argsort(self._timestamps, kind="stable")
+        self._sortedTimestamps = self._timestamps[self._sortedPositions]
+        self._isSortedByTime = bool(np.all(np.diff(self._sortedPositions) > 0))
 
     def iterPotentialNeighbors(self, value: PandasNamedTuple):
-        identifier = value.Index
-        inputTime = getattr(value, self.timestampsColumn)
-        maxTime, minTime = inputTime + self.futureTimeDelta, inputTime - self.pastTimeDelta
-        neighborsDf = self.df[
-            self.df[self.timestampsColumn].apply(lambda time: minTime < time < inputTime)
-        ]
-        if identifier in neighborsDf.index:
-            neighborsDf.drop(identifier, inplace=True)
-        return neighborsDf.itertuples()
+        for position in self.getPotentialNeighborPositions(value):
+            yield self.dataPoints.getNamedTuple(position)
+
+    def getPotentialNeighborPositions(self, value: PandasNamedTuple) -> np.ndarray:
+        inputTime = pd.Timestamp(getattr(value, self.timestampsColumn))
+        maxTimestamp = inputTime.to_datetime64()
+        minTimestamp = (inputTime - self.pastTimeDelta).to_datetime64()
+        # positions of the data points with minTime < time < inputTime
+        startIndex = np.searchsorted(self._sortedTimestamps, minTimestamp, side="right")
+        endIndex = np.searchsorted(self._sortedTimestamps, maxTimestamp, side="left")
+        if self._isSortedByTime:
+            positions = np.arange(startIndex, endIndex)
+        else:
+            positions = np.sort(self._sortedPositions[startIndex:endIndex])  # retain the order of the data frame
+        # exclude the data point itself (which can only be in the time range if its time differs from the given data point's time)
+        position = self.indexPositionDict.get(value.Index)
+        if position is not None and minTimestamp < self._timestamps[position] < maxTimestamp:
+            positions = positions[positions != position]
+        return positions
 
     def __str__(self):
         return objectRepr(self, ["pastTimeRangeDays", "futureTimeRangeDays"])
 
 
 class AbstractKnnFinder(ABC):
+    def __init__(self, neighborProvider: NeighborProvider):
+        self.neighborProvider = neighborProvider
+
     @abstractmethod
-    def findNeighbors(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> List[Neighbor]:
+    def findNeighborPositions(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the nearest neighbors of a data point, representing them by arrays (rather than Neighbor objects)
+
+        :param namedTuple: the data point for which to find neighbors
+        :param n_neighbors: the number of neighbors to find
+        :return: a pair (distances, positions) of arrays containing the distances to the nearest neighbors (in ascending order)
+            and the neighbors' positions in the neighbor provider's data frame
+        """
         pass
 
+    def findNeighbors(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> List[Neighbor]:
+        return self._createNeighbors(*self.findNeighborPositions(namedTuple, n_neighbors))
+
+    def _createNeighbors(self, distances: np.ndarray, positions: np.ndarray) -> List[Neighbor]:
+        dataPoints = self.neighborProvider.dataPoints
+        return [Neighbor(dataPoints.getNamedTuple(position), distance) for distance, position in zip(distances, positions)]
+
+    def findNeighborPositionsBatch(self, dataPoints: DataPoints, n_neighbors=20, numThreads=1) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Finds the nearest neighbors of each of the given data points
+
+        :param dataPoints: the data points for which to find neighbors
+        :param n_neighbors: the number of neighbors to find for each data point
+        :param numThreads: the number of threads with which to process the data points concurrently (use 1 to process them
+            sequentially); since the data points are processed independently and the distance computations are largely
+            carried out by numpy (releasing the GIL), using multiple threads can speed up the search
+        :return: a list containing, for each data point, the pair of arrays (distances, positions) as returned by findNeighborPositions
+        """
+        if numThreads == 1 or len(dataPoints) <= 1:
+            return self._findNeighborPositionsBatch(dataPoints, n_neighbors)
+        boundaries = np.linspace(0, len(dataPoints), min(numThreads, len(dataPoints)) + 1).astype(int)
+        chunks = [dataPoints.subset(slice(start, end)) for start, end in zip(boundaries[:-1], boundaries[1:])]
+        with ThreadPoolExecutor(max_workers=numThreads) as executor:
+            results = executor.map(lambda chunk: self._findNeighborPositionsBatch(chunk, n_neighbors), chunks)
+        return [neighborPositions for result in results for neighborPositions in result]
+
+    def _findNeighborPositionsBatch(self, dataPoints: DataPoints, n_neighbors: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        return [self.findNeighborPositions(namedTuple, n_neighbors) for namedTuple in dataPoints.iterNamedTuples()]
+
+    def findNeighborsBatch(self, dataPoints: DataPoints, n_neighbors=20, numThreads=1) -> List[List[Neighbor]]:
+        """
+        Finds the nearest neighbors of each of the given data points
+
+        :param dataPoints: the data points for which to find neighbors
+        :param n_neighbors: the number of neighbors to find for each data point
+        :param numThreads: the number of threads with which to process the data points concurrently (see findNeighborPositionsBatch)
+        :return: a list containing, for each data point, the list of its neighbors (as returned by findNeighbors)
+        """
+        return [self._createNeighbors(distances, positions)
+            for distances, positions in self.findNeighborPositionsBatch(dataPoints, n_neighbors, numThreads=numThreads)]
+
     @abstractmethod
     def __str__(self):
         super().__str__()
@@ -105,8 +260,9 @@ class AbstractKnnFinder(ABC):
 class CachingKNearestNeighboursFinder(AbstractKnnFinder):
     """
     A nearest neighbor finder which uses a cache for distance metrics in order speed up repeated computations
-    of the neighbors of the same data point by keeping a pandas.Series of distances to all provided
-    data points cached. If the distance metric is of the composite type LinearCombinationDistanceMetric,
+    of the neighbors of the same data point: for each data point (identified by its index), a numpy array of the distances
+    to its potential neighbors is cached, where the i-th distance corresponds to the i-th position returned by the neighbor
+    provider's getPotentialNeighborPositions. If the distance metric is of the composite type LinearCombinationDistanceMetric,
     its component distance metrics are cached, such that weights in the linear combination can be varied
     without necessitating recomputations.
     """
@@ -114,7 +270,7 @@ class CachingKNearestNeighboursFinder(AbstractKnnFinder):
 
     def __init__(self, cache: 'CachingKNearestNeighboursFinder.DistanceMetricCache', distanceMetric: DistanceMetric,
             neighborProvider: NeighborProvider):
-        self.neighborProvider = neighborProvider
+        super().__init__(neighborProvider)
         # This field is purely for logging purposes
         self.distanceMetric = distanceMetric
         if isinstance(distanceMetric, distance_metric.LinearCombinationDistanceMetric):
@@ -127,88 +283,240 @@ class CachingKNearestNeighboursFinder(AbstractKnnFinder):
 
     class DistanceMetricCache:
         """
-        A cache for distance metrics which identifies equivalent distance metrics by their string representations.
+        A cache for distance metrics which identifies equivalent distance metrics by their cache keys (see DistanceMetric.getCacheKey).
         The cache can be passed (consecutively) to multiple KNN models in order to speed up computations for the
         same test data points. If the cache is reused, it is assumed that the neighbor provider remains the same.
         """
         _log = _log.getChild(__qualname__)
 
-        def __init__(self):
+        def __init__(self, dtype=None):
+            """
+            :param dtype: the dtype with which to store the cached arrays of distances (e.g. np.float32 in order to halve the
+                memory required by the cache at the expense of precision); if None, store the distances as computed
+            """
+            self.dtype = dtype
             self._cachedMetricsByName = {}
 
         def getCachedMetric(self, distanceMetric):
-            key = str(distanceMetric)
+            key = distanceMetric.getCacheKey()
             cachedMetric = self._cachedMetricsByName.get(key)
             if cachedMetric is None:
-                self._log.info(f"Creating new cached metric for key '{key}'")
-                cachedMetric = CachingKNearestNeighboursFinder.CachedSeriesDistanceMetric(distanceMetric)
+                self._log.info("Creating new cached metric for %s", distanceMetric)  # lazy formatting: str may be costly
+                cachedMetric = CachingKNearestNeighboursFinder.CachedSeriesDistanceMetric(distanceMetric, dtype=self.dtype)
                 self._cachedMetricsByName[key] = cachedMetric
             else:
-                self._log.info(f"Reusing cached metric for key '{key}'")
+                self._log.info("Reusing cached metric for %s", distanceMetric)
             return cachedMetric
 
     class CachedSeriesDistanceMetric:
         """
-        Provides caching for a wrapped distance metric: the series of all distances to provided potential neighbors
-        are retained in a cache
+        Provides caching for a wrapped distance metric: the array of all distances to provided potential neighbors
+        is retained in a cache
         """
-        def __init__(self, distanceMetric):
+        def __init__(self, distanceMetric, dtype=None):
             self.distanceMetric = distanceMetric
+            self.dtype = dtype
             self.cache = {}
 
-        def getDistanceSeries(self, namedTuple: PandasNamedTuple, potentialNeighborValues):
+        def getDistanceArray(self, namedTuple: PandasNamedTuple, potentialNeighbors: DataPoints) -> np.ndarray:
             identifier = namedTuple.Index
-            series = self.cache.get(identifier)
-            if series is None:
-                distances = []
-                for neighborTuple in potentialNeighborValues:
-                    distances.append(self.distanceMetric.distance(namedTuple, neighborTuple))
-                series = pd.Series(distances)
-                self.cache[identifier] = series
-            return series
+            distances = self.cache.get(identifier)
+            if distances is None:
+                distances = self.distanceMetric.distances(namedTuple, potentialNeighbors)
+                if self.dtype is not None:
+                    distances = distances.astype(self.dtype, copy=False)
+                self.cache[identifier] = distances
+            return distances
+
+    def findNeighborPositions(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> Tuple[np.ndarray, np.ndarray]:
+        potentialNeighborPositions = self.neighborProvider.getPotentialNeighborPositions(namedTuple)
+        potentialNeighbors = self.neighborProvider.dataPoints.subset(potentialNeighborPositions)
+        if len(self.weightedDistanceMetrics) == 1 and self.weightedDistanceMetrics[0][1] == 1:
+            # the cached distances can be used directly (they are not modified)
+            summedDistances = self.weightedDistanceMetrics[0][0].getDistanceArray(namedTuple, potentialNeighbors)
+        else:
+            # accumulate the weighted distances in place, reusing a single buffer for the weighted distances
+            summedDistances = np.zeros(len(potentialNeighbors))
+            weightedDistances = np.empty(len(potentialNeighbors))
+            for metric, weight in self.weightedDistanceMetrics:
+                np.multiply(metric.getDistanceArray(namedTuple, potentialNeighbors), weight, out=weightedDistances)
+                summedDistances += weightedDistances
+        positions = _selectNeighborPositions(summedDistances, n_neighbors)
+        return summedDistances[positions], potentialNeighborPositions[positions]
 
-    def findNeighbors(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> List[Neighbor]:
-        potentialNeighbors = list(self.neighborProvider.iterPotentialNeighbors(namedTuple))
-        summedDistanceSeries = None
-        for i, (metric, weight) in enumerate(self.weightedDistanceMetrics):
-            weightedDistancesSeries = metric.getDistanceSeries(namedTuple, potentialNeighbors) * weight
-            if i == 0:
-                summedDistanceSeries = weightedDistancesSeries.copy()
-            else:
-                summedDistanceSeries += weightedDistancesSeries
-        summedDistanceSeries.sort_values(ascending=True, inplace=True)
+
+class KNearestNeighboursFinder(AbstractKnnFinder):
+    # the maximum number of entries of the distance matrices computed in findNeighborsBatch (limiting memory usage)
+    _MAX_DISTANCE_MATRIX_SIZE = 10 ** 7
+
+    def __init__(self, distanceMetric: DistanceMetric, neighborProvider: NeighborProvider, usePivotPruning=False):
+        """
+        :param distanceMetric: the distance metric to use
+        :param neighborProvider: the provider of potential neighbors
+        :param usePivotPruning: whether to avoid distance computations by means of the triangle inequality, using the distances
+            of all potential neighbors to a pivot data point as reference. This requires the metric to satisfy the triangle inequality
+            (see DistanceMetric.satisfiesTriangleInequality) and the potential neighbors not to depend on the data point
+            (as for AllNeighborsProvider); otherwise it has no effect. Pruning is most effective for expensive metrics.
+        """
+        super().__init__(neighborProvider)
+        self.distanceMetric = distanceMetric
+        self.usePivotPruning = usePivotPruning
+        self._pivotDistances = None
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d["_pivotDistances"] = None
+        return d
+
+    def __str__(self):
+        return objectRepr(self, ["neighborProvider", "distanceMetric"])
+
+    def _isPivotPruningApplicable(self) -> bool:
+        return self.usePivotPruning and self.neighborProvider.potentialNeighborsAreCommon() and \
+            self.distanceMetric.satisfiesTriangleInequality()
+
+    def _computeDistancesWithPivotPruning(self, namedTuple: PandasNamedTuple, potentialNeighbors: DataPoints,
+            numInitialNeighbors: int) -> np.ndarray:
+        """
+        Computes the distances to the potential neighbors, pruning all potential neighbors which cannot be among the nearest
+        numInitialNeighbors neighbors: By the triangle inequality, |d(o, p) - d(q, p)| is a lower bound for the distance d(q, o)
+        between the data point q and a potential neighbor o (for a pivot p).
+
+        :return: the distances, where the distances of pruned potential neighbors are infinite
+        """
+        pivot = potentialNeighbors.subset(slice(1))
+        if self._pivotDistances is None:
+            self._pivotDistances = self.distanceMetric.distances(pivot.getNamedTuple(0), potentialNeighbors)
+        lowerBounds = np.abs(self._pivotDistances - self.distanceMetric.distances(namedTuple, pivot)[0])
+        # the largest distance among the potential neighbors with the smallest lower bounds is an upper bound for the distance
+        # of the n-th nearest neighbor (threshold), so potential neighbors with greater lower bounds can be pruned
+        initialPositions = _nSmallestPositions(lowerBounds, numInitialNeighbors)
+        initialDistances = self.distanceMetric.distances(namedTuple, potentialNeighbors.subset(initialPositions))
+        threshold = np.max(initialDistances)
+        distances = np.full(len(potentialNeighbors), np.inf)
+        distances[initialPositions] = initialDistances
+        if np.isnan(threshold):
+            remainingPositions = np.flatnonzero(np.isinf(distances))
+            threshold = None
+        else:
+            isCandidate = ~(lowerBounds > threshold)
+            isCandidate[initialPositions] = False
+            remainingPositions = np.flatnonzero(isCandidate)
+        distances[remainingPositions] = self.distanceMetric.distances(namedTuple, potentialNeighbors.subset(remainingPositions),
+            threshold=threshold)
+        return distances
+
+    def findNeighborPositions(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> Tuple[np.ndarray, np.ndarray]:
+        _log.debug(f"Finding neighbors for {namedTuple.Index}")
+        if self.neighborProvider.potentialNeighborsAreCommon():
+            # use all data points directly (avoiding the creation of copies of the column arrays which exclude the
+            # data point itself) and exclude the data point when selecting the nearest neighbors
+            potentialNeighborPositions = None
+            potentialNeighbors = self.neighborProvider.dataPoints
+            excludedPosition = self.neighborProvider.indexPositionDict.get(namedTuple.Index)
+        else:
+            potentialNeighborPositions = self.neighborProvider.getPotentialNeighborPositions(namedTuple)
+            potentialNeighbors = self.neighborProvider.dataPoints.subset(potentialNeighborPositions)
+            excludedPosition = None
+        # compute the distances to all potential neighbors at once (vectorised, if supported by the metric)
+        numInitialNeighbors = n_neighbors if excludedPosition is None else n_neighbors + 1
+        if 0 < n_neighbors and numInitialNeighbors < len(potentialNeighbors) and self._isPivotPruningApplicable():
+            distances = self._computeDistancesWithPivotPruning(namedTuple, potentialNeighbors, numInitialNeighbors)
+        elif 0 < n_neighbors and numInitialNeighbors < len(potentialNeighbors):
+            # The largest distance among the first n_neighbors potential neighbors (not including the data point itself) is an upper
+            # bound for the distance of the n-th nearest neighbor, so the metric need not compute greater distances to the
+            # remaining potential neighbors exactly
+            initialDistances = self.distanceMetric.distances(namedTuple, potentialNeighbors.subset(slice(numInitialNeighbors)))
+            threshold = np.max(initialDistances)
+            remainingDistances = self.distanceMetric.distances(namedTuple,
+                potentialNeighbors.subset(slice(numInitialNeighbors, None)),
+                threshold=None if np.isnan(threshold) else threshold)
+            distances = np.concatenate((initialDistances, remainingDistances))
+        else:
+            distances = self.distanceMetric.distances(namedTuple, potentialNeighbors)
+        positions = _selectNeighborPositions(distances, n_neighbors, excludedPosition)
+        return distances[positions], positions if potentialNeighborPositions is None else potentialNeighborPositions[positions]
+
+    def _findNeighborPositionsBatch(self, dataPoints: DataPoints, n_neighbors: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # If the potential neighbors are the same for all data points and the metric supports it, we compute the distances
+        # for many data points at once (as a distance matrix); otherwise we find the neighbors of each data point separately
+        potentialNeighbors = self.neighborProvider.dataPoints
+        if not self.neighborProvider.potentialNeighborsAreCommon() or len(potentialNeighbors) == 0 or self._isPivotPruningApplicable():
+            return super()._findNeighborPositionsBatch(dataPoints, n_neighbors)
+        batchSize = max(1, self._MAX_DISTANCE_MATRIX_SIZE // len(potentialNeighbors))
         result = []
-        for i in range(n_neighbors):
-            neighborTuple = potentialNeighbors[summedDistanceSeries.index[i]]
-            distance = summedDistanceSeries.iloc[i]
-            result.append(Neighbor(neighborTuple, distance))
+        for startIndex in range(0, len(dataPoints), batchSize):
+            batchDataPoints = dataPoints.subset(slice(startIndex, startIndex + batchSize))
+            distanceMatrix = self.distanceMetric.distanceMatrix(batchDataPoints, potentialNeighbors)
+            if distanceMatrix is None:
+                return super()._findNeighborPositionsBatch(dataPoints, n_neighbors)
+            # the data points themselves may be among the potential neighbors
+            ownPositions = self.neighborProvider.getPositions([nt.Index for nt in batchDataPoints.iterNamedTuples()])
+            for distances, ownPosition in zip(distanceMatrix, ownPositions):
+                excludedPosition = None if ownPosition == -1 else ownPosition
+                positions = _selectNeighborPositions(distances, n_neighbors, excludedPosition)
+                result.append((distances[positions], positions))
         return result
 
 
-class KNearestNeighboursFinder(AbstractKnnFinder):
-
-    def __init__(self, distanceMetric: DistanceMetric, neighborProvider: NeighborProvider):
-        self.neighborProvider = neighborProvider
+class KDTreeKNearestNeighboursFinder(AbstractKnnFinder):
+    """
+    Finds nearest neighbors with respect to a Euclidean distance metric by querying a k-d tree (scipy's cKDTree), which,
+    for data of low to moderate dimensionality, avoids the computation of the distances to all potential neighbors.
+    The neighbor provider must provide the same potential neighbors for all data points (e.g. AllNeighborsProvider).
+    """
+    def __init__(self, distanceMetric: EuclideanDistanceMetric, neighborProvider: NeighborProvider):
+        super().__init__(neighborProvider)
+        if not neighborProvider.potentialNeighborsAreCommon():
+            raise ValueError(f"{self.__class__.__name__} requires a neighbor provider with common potential neighbors, got {neighborProvider}")
         self.distanceMetric = distanceMetric
+        self._tree = scipy.spatial.cKDTree(self._getPoints(neighborProvider.dataPoints.getColumnValues(distanceMetric.column)))
 
     def __str__(self):
         return objectRepr(self, ["neighborProvider", "distanceMetric"])
 
-    def findNeighbors(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> List[Neighbor]:
+    @staticmethod
+    def _getPoints(values) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        return values.reshape((len(values), -1))
+
+    def _queryTree(self, points: np.ndarray, ownPositions: np.ndarray, n_neighbors: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        numCandidates = min(n_neighbors + 1, self._tree.n)
+        if n_neighbors == 0 or numCandidates == 0:
+            return [(np.zeros(0), np.zeros(0, dtype=int)) for _ in range(len(points))]
+        # query one more neighbor than requested, because the data point itself may be among the potential neighbors
+        distancesMatrix, positionsMatrix = self._tree.query(points, k=list(range(1, numCandidates + 1)))
         result = []
-        _log.debug(f"Finding neighbors for {namedTuple.Index}")
-        for neighborTuple in self.neighborProvider.iterPotentialNeighbors(namedTuple):
-            distance = self.distanceMetric.distance(namedTuple, neighborTuple)
-            result.append(Neighbor(neighborTuple, distance))
-        result.sort(key=lambda n: n.distance)
-        return result[:n_neighbors]
+        for distances, positions, ownPosition in zip(distancesMatrix, positionsMatrix, ownPositions):
+            isSelected = positions != ownPosition
+            result.append((distances[isSelected][:n_neighbors], positions[isSelected][:n_neighbors]))
+        return result
+
+    def findNeighborPositions(self, namedTuple: PandasNamedTuple, n_neighbors=20) -> Tuple[np.ndarray, np.ndarray]:
+        points = self._getPoints([getattr(namedTuple, self.distanceMetric.column)])
+        return self._queryTree(points, self.neighborProvider.getPositions([namedTuple.Index]), n_neighbors)[0]
+
+    def _findNeighborPositionsBatch(self, dataPoints: DataPoints, n_neighbors: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        points = self._getPoints(dataPoints.getColumnValues(self.distanceMetric.column))
+        ownPositions = self.neighborProvider.getPositions([nt.Index for nt in dataPoints.iterNamedTuples()])
+        return self._queryTree(points, ownPositions, n_neighbors)
+
+
+def _createKnnFinder(distanceMetric: DistanceMetric, neighborProvider: NeighborProvider,
+        distanceMetricCache: Optional[CachingKNearestNeighboursFinder.DistanceMetricCache], useKDTree: bool) -> AbstractKnnFinder:
+    # subclasses of EuclideanDistanceMetric may compute different distances, which the k-d tree would not take into account
+    if useKDTree and type(distanceMetric) is EuclideanDistanceMetric and neighborProvider.potentialNeighborsAreCommon():
+        return KDTreeKNearestNeighboursFinder(distanceMetric, neighborProvider)
+    if distanceMetricCache is None:
+        return KNearestNeighboursFinder(distanceMetric, neighborProvider)
+    return CachingKNearestNeighboursFinder(distanceMetricCache, distanceMetric, neighborProvider)
 
 
 class KNearestNeighboursClassificationModel(VectorClassificationModel):
     def __init__(self, numNeighbors: int, distanceMetric: DistanceMetric,
             neighborProviderFactory: Callable[[pd.DataFrame], NeighborProvider] = AllNeighborsProvider,
             distanceBasedWeighting=False, distanceEpsilon=1e-3,
-            distanceMetricCache: CachingKNearestNeighboursFinder.DistanceMetricCache = None, **kwargs):
+            distanceMetricCache: CachingKNearestNeighboursFinder.DistanceMetricCache = None, numThreads=1, useKDTree=False, **kwargs):
         """
         :param numNeighbors: the number of nearest neighbors to consider
         :param distanceMetric: the distance metric to use
@@ -216,8 +524,13 @@ class KNearestNeighboursClassificationModel(VectorClassificationModel):
         :param distanceBasedWeighting: whether to weight neighbors according to their distance (inverse); if False, use democratic vote
         :param distanceEpsilon: a distance that is added to all distances for distance-based weighting (in order to avoid 0 distances);
         :param distanceMetricCache: a cache for distance metrics which shall be used to store speed up repeated computations
-            of the neighbors of the same data point by keeping series of distances cached (particularly for composite distance metrics);
+            of the neighbors of the same data point by keeping arrays of distances cached (particularly for composite distance metrics);
             see class CachingKNearestNeighboursFinder
+        :param numThreads: the number of threads with which to find the neighbors of the data points to predict for concurrently
+            (use 1 for sequential processing)
+        :param useKDTree: whether to find the neighbors by querying a k-d tree (see KDTreeKNearestNeighboursFinder) if the distance
+            metric is an EuclideanDistanceMetric (not a subclass thereof) and the neighbor provider provides the same potential
+            neighbors for all data points; otherwise, the distances to all potential neighbors are computed
         :param kwargs: parameters to pass on to super-classes
         """
         super().__init__(**kwargs)
@@ -227,43 +540,47 @@ class KNearestNeighboursClassificationModel(VectorClassificationModel):
         self.numNeighbors = numNeighbors
         self.distanceMetric = distanceMetric
         self.distanceMetricCache = distanceMetricCache
+        self.numThreads = numThreads
+        self.useKDTree = useKDTree
         self.df = None
         self.y = None
         self.knnFinder = None
+        self._targetValues = None
+        self._labelIndices = None
 
     def _fitClassifier(self, X: pd.DataFrame, y: pd.DataFrame):
         assert len(y.columns) == 1, "Expected exactly one column in label set Y"
         self.df = X.merge(y, how="inner", left_index=True, right_index=True)
         self.y = y
         neighborProvider = self.neighborProviderFactory(self.df)
-        if self.distanceMetricCache is None:
-            self.knnFinder = KNearestNeighboursFinder(self.distanceMetric, neighborProvider)
-        else:
-            self.knnFinder = CachingKNearestNeighboursFinder(self.distanceMetricCache, self.distanceMetric, neighborProvider)
+        # target values in the order of the neighbor provider's data frame, such that positions can be used for lookups
+        self._targetValues = y.iloc[:, 0].reindex(self.df.index).to_numpy()
+        self._labelIndices = pd.Index(self._labels).get_indexer(self._targetValues)  # indices of the labels in self._labels
+        self.knnFinder = _createKnnFinder(self.distanceMetric, neighborProvider, self.distanceMetricCache, self.useKDTree)
         _log.info(f"Using neighbor provider of type {self.knnFinder.__class__.__name__}")
 
     def _predictClassProbabilities(self, X: pd.DataFrame):
-        outputDf = pd.DataFrame({label: np.nan for label in self._labels}, index=X.index)
-        for nt in X.itertuples():
-            neighbors = self.findNeighbors(nt)
-            probabilities = self._predictClassProbabilityVectorFromNeighbors(neighbors)
-            outputDf.loc[nt.Index] = probabilities
-        return outputDf
-
-    def _predictClassProbabilityVectorFromNeighbors(self, neighbors: List['Neighbor']):
-        weights = collections.defaultdict(lambda: 0)
-        total = 0
-        for neigh in neighbors:
-            if self.distanceBasedWeighting:
-                weight = 1.0 / (neigh.distance + self.distanceEpsilon)
-            else:
-                weight = 1
-            weights[self._getLabel(neigh)] += weight
-            total += weight
-        return [weights[label] / total for label in self._labels]
-
-    def _getLabel(self, neighbor: 'Neighbor'):
-        return self.y.iloc[:, 0].loc[neighbor.identifier]
+        neighborPositionsList = self.knnFinder.findNeighborPositionsBatch(DataFrameDataPoints(X), self.numNeighbors,
+            numThreads=self.numThreads)
+        probabilities = np.zeros((len(X), len(self._labels)))
+        for i, (distances, positions) in enumerate(neighborPositionsList):
+            probabilities[i] = self._predictClassProbabilityVectorFromNeighborPositions(distances, positions)
+        return pd.DataFrame(probabilities, index=X.index, columns=self._labels)
+
+    def _predictClassProbabilityVectorFromNeighborPositions(self, distances: np.ndarray, positions: np.ndarray):
+        """
+        :param distances: the distances to the neighbors
+        :param positions: the positions of the neighbors in the neighbor provider's data frame
+        :return: the list of class probabilities (in the order of self._labels)
+        """
+        if not self.distanceBasedWeighting:
+            # democratic vote: the probabilities are given by the histogram of the neighbors' labels
+            labelCounts = np.bincount(self._labelIndices[positions], minlength=len(self._labels))
+            return labelCounts / len(positions)
+        # weighted vote: the probabilities are given by the labels' sums of neighbor weights
+        neighborWeights = 1.0 / (distances + self.distanceEpsilon)
+        labelWeights = np.bincount(self._labelIndices[positions], weights=neighborWeights, minlength=len(self._labels))
+        return labelWeights / np.sum(neighborWeights)
 
     def findNeighbors(self, namedTuple):
         return self.knnFinder.findNeighbors(namedTuple, self.numNeighbors)
@@ -279,7 +596,7 @@ class KNearestNeighboursRegressionModel(VectorRegressionModel):
     def __init__(self, numNeighbors: int, distanceMetric: DistanceMetric,
             neighborProviderFactory: Callable[[pd.DataFrame], NeighborProvider] = AllNeighborsProvider,
             distanceBasedWeighting=False, distanceEpsilon=1e-3,
-            distanceMetricCache: CachingKNearestNeighboursFinder.DistanceMetricCache = None, **kwargs):
+            distanceMetricCache: CachingKNearestNeighboursFinder.DistanceMetricCache = None, numThreads=1, useKDTree=False, **kwargs):
         """
         :param numNeighbors: the number of nearest neighbors to consider
         :param distanceMetric: the distance metric to use
@@ -287,8 +604,13 @@ class KNearestNeighboursRegressionModel(VectorRegressionModel):
         :param distanceBasedWeighting: whether to weight neighbors according to their distance (inverse); if False, use democratic vote
         :param distanceEpsilon: a distance that is added to all distances for distance-based weighting (in order to avoid 0 distances);
         :param distanceMetricCache: a cache for distance metrics which shall be used to store speed up repeated computations
-            of the neighbors of the same data point by keeping series of distances cached (particularly for composite distance metrics);
+            of the neighbors of the same data point by keeping arrays of distances cached (particularly for composite distance metrics);
             see class CachingKNearestNeighboursFinder
+        :param numThreads: the number of threads with which to find the neighbors of the data points to predict for concurrently
+            (use 1 for sequential processing)
+        :param useKDTree: whether to find the neighbors by querying a k-d tree (see KDTreeKNearestNeighboursFinder) if the distance
+            metric is an EuclideanDistanceMetric (not a subclass thereof) and the neighbor provider provides the same potential
+            neighbors for all data points; otherwise, the distances to all potential neighbors are computed
         :param kwargs: parameters to pass on to super-classes
         """
         super().__init__(**kwargs)
@@ -298,37 +620,43 @@ class KNearestNeighboursRegressionModel(VectorRegressionModel):
         self.numNeighbors = numNeighbors
         self.distanceMetric = distanceMetric
         self.distanceMetricCache = distanceMetricCache
+        self.numThreads = numThreads
+        self.useKDTree = useKDTree
         self.df = None
         self.y = None
         self.knnFinder = None
+        self._targetValues = None
 
     def _fit(self, X: pd.DataFrame, y: pd.DataFrame):
         assert len(y.columns) == 1, "Expected exactly one column in label set Y"
         self.df = X.merge(y, how="inner", left_index=True, right_index=True)
         self.y = y
         neighborProvider = self.neighborProviderFactory(self.df)
-        if self.distanceMetricCache is None:
-            self.knnFinder = KNearestNeighboursFinder(self.distanceMetric, neighborProvider)
-        else:
-            self.knnFinder = CachingKNearestNeighboursFinder(self.distanceMetricCache, self.distanceMetric, neighborProvider)
+        # target values in the order of the neighbor provider's data frame, such that positions can be used for lookups
+        self._targetValues = y.iloc[:, 0].reindex(self.df.index).to_numpy()
+        self.knnFinder = _createKnnFinder(self.distanceMetric, neighborProvider, self.distanceMetricCache, self.useKDTree)
         _log.info(f"Using neighbor provider of type {self.knnFinder.__class__.__name__}")
 
-    def _getTarget(self, neighbor: Neighbor):
-        return self.y.iloc[:, 0].loc[neighbor.identifier]
-
     def _predictSingleInput(self, namedTuple):
-        neighbors = self.knnFinder.findNeighbors(namedTuple, self.numNeighbors)
-        neighborTargets = np.array([self._getTarget(n) for n in neighbors])
+        return self._predictFromNeighborPositions(*self.knnFinder.findNeighborPositions(namedTuple, self.numNeighbors))
+
+    def _predictFromNeighborPositions(self, distances: np.ndarray, positions: np.ndarray):
+        """
+        :param distances: the distances to the neighbors
+        :param positions: the positions of the neighbors in the neighbor provider's data frame
+        :return: the predicted value
+        """
+        neighborTargets = self._targetValues[positions]
         if self.distanceBasedWeighting:
-            neighborWeights = np.array([1.0 / (n.distance + self.distanceEpsilon) for n in neighbors])
+            neighborWeights = 1.0 / (distances + self.distanceEpsilon)
             return np.sum(neighborTargets * neighborWeights) / np.sum(neighborWeights)
         else:
             return np.mean(neighborTargets)
 
     def _predict(self, x: pd.DataFrame) -> pd.DataFrame:
-        predictedValues = []
-        for i, nt in enumerate(x.itertuples()):
-            predictedValues.append(self._predictSingleInput(nt))
+        neighborPositionsList = self.knnFinder.findNeighborPositionsBatch(DataFrameDataPoints(x), self.numNeighbors,
+            numThreads=self.numThreads)
+        predictedValues = [self._predictFromNeighborPositions(distances, positions) for distances, positions in neighborPositionsList]
         return pd.DataFrame({self._predictedVariableNames[0]: predictedValues}, index=x.index)
 
     def __str__(self):
@@ -9,7 +9,7 @@ import sqlite3
 import threading
 import time
 from abc import abstractmethod, ABC
-from typing import Any, Callable, Iterator, List, Optional, TypeVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
 
 import joblib
 
@@ -42,6 +42,33 @@ class PersistentKeyValueCache(ABC):
         """
         pass
 
+    def getMany(self, keys: Iterable) -> Dict[Any, Any]:
+        """
+        Retrieves multiple cached values at once.
+        The default implementation retrieves the values one by one; subclasses should override this method if
+        the values can be retrieved more efficiently in a single operation.
+
+        :param keys: the lookup keys
+        :return: a dictionary mapping each key for which a value was found to the respective cached value
+        """
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def setMany(self, items: Dict[Any, Any]):
+        """
+        Sets multiple cached values at once.
+        The default implementation sets the values one by one; subclasses should override this method if
+        the values can be stored more efficiently in a single operation.
+
+        :param items: a dictionary mapping keys to the values to store (which must not be None)
+        """
+        for key, value in items.items():
+            self.set(key, value)
+
 
 class PersistentList(ABC):
     @abstractmethod
@@ -176,6 +203,14 @@ class PicklePersistentKeyValueCache(PersistentKeyValueCache):
         if self.saveOnUpdate:
             self._updateHook.handleUpdate()
 
+    def getMany(self, keys: Iterable) -> Dict[Any, Any]:
+        return {key: self.cache[key] for key in keys if key in self.cache}
+
+    def setMany(self, items: Dict[Any, Any]):
+        self.cache.update(items)
+        if self.saveOnUpdate:
+            self._updateHook.handleUpdate()
+
 
 class SlicedPicklePersistentList(PersistentList):
     """
@@ -347,6 +382,8 @@ class SqlitePersistentKeyValueCache(PersistentKeyValueCache):
         STRING = ("VARCHAR(%d)", )
         INTEGER = ("LONG", )
 
+    _MAX_QUERY_PARAMETERS = 500
+
     def __init__(self, path, tableName="cache", deferredCommitDelaySecs=1.0, keyType: KeyType = KeyType.STRING,
             maxKeyLength=255):
         """
@@ -395,18 +432,32 @@ class SqlitePersistentKeyValueCache(PersistentKeyValueCache):
         finally:
             self._connMutex.release()
 
+    def _setEntry(self, cursor, dbKey, storedValue):
+        """
+        Inserts or updates a single entry (without committing)
+
+        :param cursor: the cursor with which to execute the queries
+        :param dbKey: the key as stored in the database (see _keyDbValue)
+        :param storedValue: the pickled value
+        """
+        cursor.execute(f"SELECT COUNT(*) FROM {self.tableName} WHERE cache_key=?", (dbKey, ))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"INSERT INTO {self.tableName} (cache_key, cache_value) VALUES (?, ?)", (dbKey, storedValue))
+        else:
+            cursor.execute(f"UPDATE {self.tableName} SET cache_value=? WHERE cache_key=?", (storedValue, dbKey))
+        self._numEntriesToBeCommitted += 1
+
     def set(self, key, value):
+        self.setMany({key: value})
+
+    def setMany(self, items: Dict[Any, Any]):
+        # convert all keys and values before writing, such that invalid items do not result in partial updates
+        entries = [(self._keyDbValue(key), pickle.dumps(value)) for key, value in items.items()]
         self._connMutex.acquire()
         try:
             cursor = self.conn.cursor()
-            key = self._keyDbValue(key)
-            cursor.execute(f"SELECT COUNT(*) FROM {self.tableName} WHERE cache_key=?", (key, ))
-            if cursor.fetchone()[0] == 0:
-                cursor.execute(f"INSERT INTO {self.tableName} (cache_key, cache_value) VALUES (?, ?)",
-                               (key, pickle.dumps(value)))
-            else:
-                cursor.execute(f"UPDATE {self.tableName} SET cache_value=? WHERE cache_key=?", (pickle.dumps(value), key))
-            self._numEntriesToBeCommitted += 1
+            for dbKey, storedValue in entries:
+                self._setEntry(cursor, dbKey, storedValue)
             cursor.close()
         finally:
             self._connMutex.release()
@@ -433,6 +484,25 @@ class SqlitePersistentKeyValueCache(PersistentKeyValueCache):
         finally:
             self._connMutex.release()
 
+    def getMany(self, keys: Iterable) -> Dict[Any, Any]:
+        keysByDbKey = {self._keyDbValue(key): key for key in keys}
+        dbKeys = list(keysByDbKey.keys())
+        result = {}
+        self._connMutex.acquire()
+        try:
+            cursor = self.conn.cursor()
+            # query in chunks in order to respect SQLite's limit on the number of query parameters
+            for i in range(0, len(dbKeys), self._MAX_QUERY_PARAMETERS):
+                chunk = dbKeys[i:i+self._MAX_QUERY_PARAMETERS]
+                self._execute(cursor, f"SELECT cache_key, cache_value FROM {self.tableName} WHERE cache_key IN ({', '.join('?' * len(chunk))})",
+                    chunk)
+                for dbKey, value in cursor.fetchall():
+                    result[keysByDbKey[dbKey]] = pickle.loads(value)
+            cursor.close()
+            return result
+        finally:
+            self._connMutex.release()
+
     def __len__(self):
         self._connMutex.acquire()
         try:
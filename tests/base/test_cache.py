@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from sensai.util.cache import PicklePersistentKeyValueCache, SqlitePersistentKeyValueCache
+
+
+def createCaches(tmpdir):
+    return [PicklePersistentKeyValueCache(os.path.join(tmpdir, "cache.pickle"), saveOnUpdate=False),
+        SqlitePersistentKeyValueCache(os.path.join(tmpdir, "cache.sqlite"), deferredCommitDelaySecs=0.1),
+        SqlitePersistentKeyValueCache(os.path.join(tmpdir, "cache_int.sqlite"), deferredCommitDelaySecs=0.1,
+            keyType=SqlitePersistentKeyValueCache.KeyType.INTEGER)]
+
+
+@pytest.mark.parametrize("cacheIndex", [0, 1, 2])
+def test_get_set_many(tmpdir, cacheIndex):
+    cache = createCaches(str(tmpdir))[cacheIndex]
+    numKeys = 3 * SqlitePersistentKeyValueCache._MAX_QUERY_PARAMETERS + 7
+    items = {i: {"value": i} for i in range(numKeys)}
+    cache.setMany(items)
+    assert cache.getMany(range(numKeys)) == items
+    # missing keys are omitted from the result
+    assert cache.getMany([numKeys + 1, 3, numKeys + 2]) == {3: {"value": 3}}
+    assert cache.getMany([]) == {}
+    # existing keys are overwritten, by bulk writes as well as by single writes
+    cache.setMany({i: {"value": -i} for i in range(0, numKeys, 2)})
+    cache.set(1, "one")
+    assert cache.get(1) == "one"
+    assert cache.get(2) == {"value": -2}
+    assert cache.getMany([2, 3]) == {2: {"value": -2}, 3: {"value": 3}}
+    expectedValues = {i: ({"value": -i} if i % 2 == 0 else {"value": i}) for i in range(numKeys)}
+    expectedValues[1] = "one"
+    assert cache.getMany(range(numKeys)) == expectedValues
+    if isinstance(cache, SqlitePersistentKeyValueCache):
+        assert len(cache) == numKeys
+
+
+def test_sqlite_set_many_invalid_key(tmpdir):
+    cache = SqlitePersistentKeyValueCache(os.path.join(str(tmpdir), "cache.sqlite"), deferredCommitDelaySecs=0.1)
+    with pytest.raises(ValueError):
+        cache.setMany({"a": 1, "x" * 300: 2})
+    assert cache.get("a") is None
@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
+
+from sensai.data_transformation import DFTOneHotEncoder, DFTNormalisation, DFTConditionalRowFilterOnColumn, \
+    DFTVectorizedConditionalRowFilterOnColumn, DataFrameTransformerChain, DFTRenameColumns, DFTColumnFilter, DFTCountEntries, \
+    DFTSkLearnTransformer, DFTModifyColumnVectorized, DFTRowFilter, \
+    DFTKeepColumns, DFTInSetComparisonRowFilterOnColumn, DFTNotInSetComparisonRowFilterOnColumn, \
+    DFTDRowFilterOnIndex
+from sensai.util.string import orRegexGroup
+
+
+def test_one_hot_encoder():
+    inputDf = pd.DataFrame({"a": ["x", "y", "x"], "b": [1, 2, 3], "c": ["u", "u", "v"]})
+    dft = DFTOneHotEncoder(["a", "c"])
+    dft.fit(inputDf)
+    resultDf = dft.apply(inputDf)
+    expectedDf = pd.DataFrame({"b": [1, 2, 3], "a_0": [1, 0, 1], "a_1": [0, 1, 0], "c_0": [1, 1, 0], "c_1": [0, 0, 1]})
+    assert list(resultDf.columns) == list(expectedDf.columns)
+    assert np.array_equal(resultDf.values, expectedDf.values)
+    assert list(inputDf.columns) == ["a", "b", "c"]
+
+
+def test_one_hot_encoder_sparse():
+    inputDf = pd.DataFrame({"a": ["x", "y", "x"], "b": [1, 2, 3]})
+    dft = DFTOneHotEncoder("a", sparse=True)
+    dft.fit(inputDf)
+    resultDf = dft.apply(inputDf)
+    assert list(resultDf.columns) == ["b", "a_0", "a_1"]
+    assert isinstance(resultDf["a_0"].dtype, pd.SparseDtype)
+    assert list(resultDf["a_0"].sparse.to_dense()) == [1, 0, 1]
+
+
+def test_normalisation():
+    inputDf = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0], "c": [7, 8, 9]})
+    dft = DFTNormalisation([DFTNormalisation.Rule(r"a|b", transformer=StandardScaler()), DFTNormalisation.Rule("c", skip=True)])
+    dft.fit(inputDf)
+    resultDf = dft.apply(inputDf)
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    expectedValues = (values - values.mean()) / values.std()
+    assert np.allclose(resultDf[["a", "b"]].values.flatten(order="F"), expectedValues)
+    assert list(resultDf["c"]) == [7, 8, 9]
+    assert list(inputDf["a"]) == [1.0, 2.0, 3.0]
+
+
+def test_conditional_row_filter_on_column():
+    inputDf = pd.DataFrame({"a": [1, -2, 3], "b": [4, 5, 6]})
+    expectedDf = inputDf.iloc[[0, 2]]
+    assert DFTConditionalRowFilterOnColumn("a", lambda x: x > 0).apply(inputDf).equals(expectedDf)
+    assert DFTConditionalRowFilterOnColumn("a", lambda s: s > 0, vectorized=True).apply(inputDf).equals(expectedDf)
+    assert DFTVectorizedConditionalRowFilterOnColumn("a", lambda s: s > 0).apply(inputDf).equals(expectedDf)
+    timeDf = pd.DataFrame({"t": pd.to_datetime(["2019-05-01", "2021-03-01"]), "d": pd.to_timedelta([3, 1], unit="D")})
+    assert DFTConditionalRowFilterOnColumn("t", lambda t: t.year > 2020).apply(timeDf).equals(timeDf.iloc[[1]])
+    assert DFTConditionalRowFilterOnColumn("d", lambda d: d.days > 2).apply(timeDf).equals(timeDf.iloc[[0]])
+
+
+def test_chain_compile_merges_renames():
+    inputDf = pd.DataFrame({"a": [1], "b": [2], "c": [3]})
+    chain = DataFrameTransformerChain([DFTRenameColumns({"a": "x", "b": "y"}), DFTRenameColumns({"x": "z", "c": "w"}),
+        DFTColumnFilter(drop="y")])
+    compiledChain = chain.compile()
+    assert len(compiledChain.dataFrameTransformers) == 2
+    assert compiledChain.apply(inputDf).equals(chain.apply(inputDf))
+    assert list(compiledChain.apply(inputDf).columns) == ["z", "w"]
+
+
+def test_normalisation_rule_matching():
+    columns = ["a1", "a2", "b", "c", "dd"]
+    rules = [DFTNormalisation.Rule(r"a\d"), DFTNormalisation.Rule(r"b|c"), DFTNormalisation.Rule(r"(d)\1")]
+    assert DFTNormalisation._matchColumnsToRules(rules, columns) == [["a1", "a2"], ["b", "c"], ["dd"]]
+    rules = [DFTNormalisation.Rule(r"a\d"), DFTNormalisation.Rule(r"b|c")]
+    assert DFTNormalisation._matchColumnsToRules(rules, columns) == [["a1", "a2"], ["b", "c"]]
+    with pytest.raises(Exception):
+        DFTNormalisation._matchColumnsToRules([DFTNormalisation.Rule(r"a\d"), DFTNormalisation.Rule("b"), DFTNormalisation.Rule("a1")], columns)
+    # a global flag in one rule's regex must not apply to the other rules
+    rules = [DFTNormalisation.Rule(r"(?i)a"), DFTNormalisation.Rule(r"b")]
+    assert DFTNormalisation._matchColumnsToRules(rules, ["A", "B", "a", "b"]) == [["A", "a"], ["b"]]
+
+
+def test_normalisation_rule_literal_matching():
+    names = ["a", "b.c", "d|e", "f\\g", "(h)", "i[0]"]
+    assert DFTNormalisation.Rule(orRegexGroup(names))._getLiterals() == frozenset(names)
+    for regex in (r"(a|b\d)", r"(a)|(b)", r"(a)b(c)", r"a|b", r"(?i)(a|b)"):
+        assert DFTNormalisation.Rule(regex)._getLiterals() is None
+    columns = names + ["bxc", "d", "i0", "x1", "x2"]
+    rules = [DFTNormalisation.Rule(r"x\d"), DFTNormalisation.Rule(orRegexGroup(names[:3])), DFTNormalisation.Rule(orRegexGroup(names[3:]))]
+    assert DFTNormalisation._matchColumnsToRules(rules, columns) == [["x1", "x2"], names[:3], names[3:]]
+    for duplicateRule in (DFTNormalisation.Rule(orRegexGroup(["x1"])), DFTNormalisation.Rule(r"b.c")):
+        with pytest.raises(Exception):
+            DFTNormalisation._matchColumnsToRules(rules + [duplicateRule], columns)
+
+
+def test_one_hot_encoder_dtype():
+    inputDf = pd.DataFrame({"a": ["x", "y", "x"]})
+    for dtype in (np.uint8, np.bool_, np.float64):
+        dft = DFTOneHotEncoder("a", dtype=dtype)
+        dft.fit(inputDf)
+        resultDf = dft.apply(inputDf)
+        assert all(resultDf.dtypes == dtype)
+        assert list(resultDf["a_1"]) == [0, 1, 0]
+
+
+def test_count_entries():
+    inputDf = pd.DataFrame({"a": ["x", "y", "x", "x", "z", "z"], "b": [1, 2, 1, 1, 3, 3]})
+    resultDf = DFTCountEntries("a").apply(inputDf)
+    assert resultDf.equals(pd.DataFrame({"a": ["x", "z", "y"], "counts": [3, 2, 1]}))
+    resultDf = DFTCountEntries("b", "n").apply(inputDf)
+    assert resultDf.equals(pd.DataFrame({"b": [1, 3, 2], "n": [3, 2, 1]}))
+    categoricalDf = pd.DataFrame({"a": pd.Categorical(["x", "y", "x"], categories=["x", "y", "z"])})
+    resultDf = DFTCountEntries("a").apply(categoricalDf)
+    assert list(resultDf["a"]) == ["x", "y"] and list(resultDf["counts"]) == [2, 1]
+
+
+def test_sklearn_transformer():
+    inputDf = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [4.0, 6.0, 8.0]})
+    for columns in (None, ["a", "b"], ["b"]):
+        for inplace in (False, True):
+            df = inputDf.copy()
+            dft = DFTSkLearnTransformer(StandardScaler(), columns=columns, inplace=inplace)
+            dft.fit(df)
+            resultDf = dft.apply(df)
+            transformedColumns = ["a", "b"] if columns is None else columns
+            for c in ["a", "b"]:
+                expected = (inputDf[c] - inputDf[c].mean()) / inputDf[c].std(ddof=0) if c in transformedColumns else inputDf[c]
+                assert np.allclose(resultDf[c], expected)
+            assert np.allclose(dft.applyInverse(resultDf).values, inputDf.values)
+            if inplace:
+                assert resultDf is df
+            else:
+                assert df.equals(inputDf)
+    # a transformer which transforms its input in place must not modify the input data frame unless inplace is True
+    df = inputDf.copy()
+    dft = DFTSkLearnTransformer(StandardScaler(copy=False))
+    dft.fit(df)
+    resultDf = dft.apply(df)
+    assert df.equals(inputDf)
+    assert not np.shares_memory(resultDf.values, df.values)
+
+
+def test_normalisation_transform_fast_path():
+    values = np.array([[1, 5], [2, 7], [4, 9]])
+    for transformer in (StandardScaler(), StandardScaler(with_mean=False), MinMaxScaler(), MinMaxScaler(feature_range=(-1, 1)),
+            RobustScaler()):
+        transformer.fit(values.reshape((values.size, 1)))
+        expected = transformer.transform(values.reshape((values.size, 1))).reshape(values.shape)
+        assert np.allclose(DFTNormalisation._transform(transformer, values), expected)
+
+
+def test_one_hot_encoder_categories():
+    inputDf = pd.DataFrame({"a": ["x", "y", "x"], "b": [3, 1, 2]})
+    dft = DFTOneHotEncoder(["a", "b"], categories={"a": np.array(["z", "y", "x"]), "b": np.array([1, 2, 3, 4])}, ignoreUnknown=True)
+    dft.fit(inputDf)
+    resultDf = dft.apply(pd.DataFrame({"a": ["y", "w"], "b": [4, 1]}))
+    assert list(resultDf.columns) == ["a_0", "a_1", "a_2", "b_0", "b_1", "b_2", "b_3"]
+    assert resultDf.values.tolist() == [[0, 1, 0, 0, 0, 0, 1], [0, 0, 0, 1, 0, 0, 0]]
+
+
+def test_chain_compile_merges_vectorized_column_modifications():
+    inputDf = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0]})
+    chain = DataFrameTransformerChain([DFTModifyColumnVectorized("a", lambda x: x + 1), DFTModifyColumnVectorized("a", np.sqrt),
+        DFTModifyColumnVectorized("b", lambda x: x * 2)])
+    compiledChain = chain.compile()
+    assert len(compiledChain.dataFrameTransformers) == 2
+    assert compiledChain.apply(inputDf.copy()).equals(chain.apply(inputDf.copy()))
+
+
+def test_chain_compile_merges_vectorized_string_modifications():
+    inputDf = pd.DataFrame({"a": [1, 2, 3]})
+    chain = DataFrameTransformerChain([DFTModifyColumnVectorized("a", lambda x: [str(v) for v in x]),
+        DFTModifyColumnVectorized("a", lambda x: x + "_s")])
+    compiledChain = chain.compile()
+    assert len(compiledChain.dataFrameTransformers) == 1
+    resultDf = compiledChain.apply(inputDf.copy())
+    assert resultDf.equals(chain.apply(inputDf.copy()))
+    assert list(resultDf["a"]) == ["1_s", "2_s", "3_s"]
+
+
+def test_chain_compile_merges_vectorized_modifications_with_pandas_conversions():
+    inputDf = pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6]}, index=[10, 11, 12])
+    for columnTransform, expectedValues in ((lambda x: 1, [2, 2, 2]), (lambda x: pd.Series(x + 1), [np.nan] * 3),
+            (lambda x: pd.Categorical(x % 2), [1, 0, 1])):
+        chain = DataFrameTransformerChain([DFTModifyColumnVectorized("a", columnTransform),
+            DFTModifyColumnVectorized("a", lambda x: x.codes if isinstance(x, pd.Categorical) else x + 1),
+            DFTModifyColumnVectorized("a", lambda x: x)])
+        compiledChain = chain.compile()
+        assert len(compiledChain.dataFrameTransformers) == 1
+        resultDf = compiledChain.apply(inputDf.copy())
+        assert resultDf.equals(chain.apply(inputDf.copy()))
+        assert np.allclose(resultDf["a"].values.astype(float), expectedValues, equal_nan=True)
+
+
+def test_normalisation_threads():
+    rand = np.random.RandomState(42)
+    inputDf = pd.DataFrame(rand.normal(size=(100, 6)), columns=["a1", "a2", "b", "c1", "c2", "d"])
+
+    def createRules():
+        return [DFTNormalisation.Rule(r"a\d", transformer=StandardScaler()), DFTNormalisation.Rule("b", transformer=MinMaxScaler()),
+            DFTNormalisation.Rule(r"c\d", transformer=RobustScaler()), DFTNormalisation.Rule("d", skip=True)]
+
+    dft = DFTNormalisation(createRules())
+    dft.fit(inputDf)
+    dftThreaded = DFTNormalisation(createRules(), numThreads=3)
+    dftThreaded.fit(inputDf)
+    assert dftThreaded.apply(inputDf).equals(dft.apply(inputDf))
+
+
+def test_row_filter():
+    inputDf = pd.DataFrame({"a": [1, -2, 3], "b": [4, 5, -6]}, index=["x", "y", "z"])
+    expectedDf = inputDf.iloc[[0]]
+    assert DFTRowFilter(lambda row: row["a"] > 0 and row["b"] > 0).apply(inputDf).equals(expectedDf)
+    assert DFTRowFilter(lambda nt: nt.a > 0 and nt.b > 0, namedTuples=True).apply(inputDf).equals(expectedDf)
+
+
+def test_normalisation_dtype():
+    inputDf = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [4, 5, 6]})
+    dft = DFTNormalisation([DFTNormalisation.Rule(r"a|b", transformer=StandardScaler())], dtype=np.float32)
+    dft.fit(inputDf)
+    resultDf = dft.apply(inputDf)
+    assert all(resultDf.dtypes == np.float32)
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    assert np.allclose(resultDf.values.flatten(order="F"), (values - values.mean()) / values.std())
+
+
+def test_column_filter():
+    inputDf = pd.DataFrame({"a": [1], "b": [2], "c": [3]})
+    assert list(DFTColumnFilter(keep=["c", "a"]).apply(inputDf).columns) == ["c", "a"]
+    assert list(DFTColumnFilter(keep=["a", "b", "c"], drop="b").apply(inputDf).columns) == ["a", "c"]
+    assert DFTColumnFilter(keep=["a", "b", "c"]).apply(inputDf) is inputDf
+    assert DFTKeepColumns(keep=["a", "b", "c"]).apply(inputDf) is inputDf
+    assert list(DFTKeepColumns(keep="b").apply(inputDf).columns) == ["b"]
+    with pytest.raises(KeyError):
+        DFTColumnFilter(keep=["a", "d"]).apply(inputDf)
+
+
+def test_set_comparison_row_filters():
+    inputDf = pd.DataFrame({"a": [1, "x", 2, 3], "b": [(1, 2), (3, 4), (1, 2), (5, 6)]})
+    assert DFTInSetComparisonRowFilterOnColumn("a", {1, "x"}).apply(inputDf).equals(inputDf.iloc[[0, 1]])
+    assert DFTNotInSetComparisonRowFilterOnColumn("a", {1, "x"}).apply(inputDf).equals(inputDf.iloc[[2, 3]])
+    assert DFTInSetComparisonRowFilterOnColumn("b", {(1, 2)}).apply(inputDf).equals(inputDf.iloc[[0, 2]])
+    assert DFTInSetComparisonRowFilterOnColumn("a", set()).apply(inputDf).empty
+    noneDf = pd.DataFrame({"a": [1, None, "x", 2]})
+    assert DFTInSetComparisonRowFilterOnColumn("a", {1, None}).apply(noneDf).equals(noneDf.iloc[[0, 1]])
+    assert DFTNotInSetComparisonRowFilterOnColumn("a", {1, None}).apply(noneDf).equals(noneDf.iloc[[2, 3]])
+
+
+def test_row_filter_on_index():
+    inputDf = pd.DataFrame({"a": [1, 2, 3, 4]}, index=["w", "x", "y", "z"])
+    assert DFTDRowFilterOnIndex(keep=["z", "x"]).apply(inputDf).equals(inputDf.loc[["z", "x"]])
+    assert DFTDRowFilterOnIndex(drop={"x", "y"}).apply(inputDf).equals(inputDf.loc[["w", "z"]])
+    assert DFTDRowFilterOnIndex(keep=["z", "x", "w"], drop={"x"}).apply(inputDf).equals(inputDf.loc[["z", "w"]])
+    with pytest.raises(KeyError):
+        DFTDRowFilterOnIndex(keep={"x", "v"}).apply(inputDf)
@@ -2,7 +2,8 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from sensai.featuregen import FeatureGeneratorFlattenColumns, FeatureGeneratorTakeColumns, flattenedFeatureGenerator
+from sensai.featuregen import FeatureGeneratorFlattenColumns, FeatureGeneratorTakeColumns, flattenedFeatureGenerator, \
+    FeatureGeneratorFromNamedTuples, MultiFeatureGenerator
 
 
 def test_take_columns():
@@ -36,3 +37,56 @@ def test_getFlattenedFeatureGenerator():
     inputDf = pd.DataFrame({"a": [np.array([1, 2])], "b": [np.array([5, 6])]})
     fgen1 = flattenedFeatureGenerator(FeatureGeneratorTakeColumns("a"))
     assert fgen1.generate(inputDf).equals(pd.DataFrame({"a_0": [1], "a_1": [2]}))
+
+
+class SumFeatureGenerator(FeatureGeneratorFromNamedTuples):
+    def __init__(self, vectorized: bool):
+        super().__init__()
+        self.vectorized = vectorized
+
+    def fit(self, X, Y=None, ctx=None):
+        pass
+
+    def _generateFeatureDict(self, namedTuple):
+        return {"sum": namedTuple.a + namedTuple.b}
+
+    def _generateVectorized(self, df):
+        if not self.vectorized:
+            return None
+        return pd.DataFrame({"sum": df["a"].values + df["b"].values}, index=df.index)
+
+
+class SumFeatureValuesGenerator(SumFeatureGenerator):
+    def _getFeatureNames(self):
+        return ["sum"]
+
+    def _generateFeatureValues(self, namedTuple):
+        return [namedTuple.a + namedTuple.b]
+
+
+def test_from_named_tuples():
+    inputDf = pd.DataFrame({"a": [1, 2], "b": [3, 4]}, index=[7, 8])
+    expectedDf = pd.DataFrame({"sum": [4, 6]}, index=[7, 8])
+    assert SumFeatureGenerator(False).generate(inputDf).equals(expectedDf)
+    assert SumFeatureGenerator(True).generate(inputDf).equals(expectedDf)
+    assert SumFeatureValuesGenerator(False).generate(inputDf).equals(expectedDf)
+
+
+def test_from_named_tuples_requires_feature_generation():
+    class IncompleteFeatureGenerator(FeatureGeneratorFromNamedTuples):
+        def fit(self, X, Y=None, ctx=None):
+            pass
+
+        def _getFeatureNames(self):
+            return ["sum"]
+
+    with pytest.raises(TypeError):
+        IncompleteFeatureGenerator()
+
+
+def test_multi_feature_generator_threads():
+    inputDf = pd.DataFrame({"a": [1, 2], "b": [3, 4], "c": [5, 6]})
+    fgens = [FeatureGeneratorTakeColumns("a"), FeatureGeneratorTakeColumns("c"), FeatureGeneratorTakeColumns("b")]
+    expectedDf = inputDf[["a", "c", "b"]]
+    assert MultiFeatureGenerator(fgens).generate(inputDf).equals(expectedDf)
+    assert MultiFeatureGenerator(fgens, numThreads=3).generate(inputDf).equals(expectedDf)
@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensai.distance_metric import EuclideanDistanceMetric, LinearCombinationDistanceMetric, IdentityDistanceMetric, DataFrameDataPoints, \
+    HellingerDistanceMetric, RelativeBitwiseEqualityDistanceMetric
+from sensai.nearest_neighbors import KNearestNeighboursClassificationModel, KNearestNeighboursRegressionModel, \
+    KNearestNeighboursFinder, AllNeighborsProvider, CachingKNearestNeighboursFinder, \
+    TimerangeNeighborsProvider, KDTreeKNearestNeighboursFinder, _nSmallestPositions, _createKnnFinder
+
+
+def createDataFrame(n=50, seed=42):
+    rand = np.random.RandomState(seed)
+    return pd.DataFrame({"x": list(rand.uniform(size=(n, 3))), "y": rand.uniform(size=n), "c": rand.choice(["a", "b"], size=n)},
+        index=[f"id{i}" for i in range(n)])
+
+
+def findNeighborsNaively(df, namedTuple, distanceMetric, numNeighbors):
+    neighbors = [(distanceMetric.distance(namedTuple, nt), nt.Index) for nt in df.itertuples() if nt.Index != namedTuple.Index]
+    neighbors.sort(key=lambda n: n[0])
+    return neighbors[:numNeighbors]
+
+
+def test_find_neighbors():
+    df = createDataFrame()
+    metrics = [EuclideanDistanceMetric("x"), EuclideanDistanceMetric("y"), IdentityDistanceMetric("c"),
+        LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x")), (0.5, IdentityDistanceMetric("c"))])]
+    finders = [KNearestNeighboursFinder(metric, AllNeighborsProvider(df)) for metric in metrics] + \
+        [CachingKNearestNeighboursFinder(CachingKNearestNeighboursFinder.DistanceMetricCache(), metric, AllNeighborsProvider(df))
+            for metric in metrics] + \
+        [KDTreeKNearestNeighboursFinder(metric, AllNeighborsProvider(df)) for metric in metrics[:2]]
+    for finder in finders:
+        metric = finder.distanceMetric
+        for nt in df.iloc[:5].itertuples():
+            neighbors = finder.findNeighbors(nt, 10)
+            expectedNeighbors = findNeighborsNaively(df, nt, metric, 10)
+            assert len(neighbors) == 10
+            assert np.allclose([n.distance for n in neighbors], [n[0] for n in expectedNeighbors])
+            assert [n.identifier for n in neighbors] == [n[1] for n in expectedNeighbors]
+            distances, positions = finder.findNeighborPositions(nt, 10)
+            assert list(df.index[positions]) == [n[1] for n in expectedNeighbors]
+            assert np.array_equal(distances, [n.distance for n in neighbors])
+
+
+def test_n_smallest_positions():
+    rand = np.random.RandomState(42)
+    values = rand.randint(0, 10, size=100).astype(float)
+    values[[3, 50]] = np.nan
+    for n in (0, 1, 5, 30, 98, 99, 100, 120):
+        assert list(_nSmallestPositions(values, n)) == list(np.argsort(values, kind="stable")[:n])
+
+
+def test_linear_combination_distances_threshold():
+    df = createDataFrame()
+    metric = LinearCombinationDistanceMetric([(2.0, EuclideanDistanceMetric("y")), (1.0, EuclideanDistanceMetric("x"))])
+    query = next(df.itertuples())
+    distances = metric.distances(query, DataFrameDataPoints(df))
+    threshold = np.median(distances)
+    thresholdedDistances = metric.distances(query, DataFrameDataPoints(df), threshold=threshold)
+    isRelevant = distances <= threshold
+    assert np.allclose(thresholdedDistances[isRelevant], distances[isRelevant])
+    assert np.all(thresholdedDistances[~isRelevant] > threshold)
+
+
+def test_timerange_neighbors_provider():
+    rand = np.random.RandomState(42)
+    df = pd.DataFrame({"timestamps": pd.Timestamp("2020-01-01") + pd.to_timedelta(rand.randint(0, 365, size=100), unit="D")})
+    queryDf = df.copy()
+    queryDf["timestamps"] += pd.to_timedelta(rand.randint(-10, 10, size=100), unit="D")
+    for providerDf in (df, df.sort_values("timestamps")):
+        provider = TimerangeNeighborsProvider(providerDf, pastTimeRangeDays=30)
+        for nt in list(providerDf.itertuples()) + list(queryDf.itertuples()):
+            minTime = nt.timestamps - pd.Timedelta(days=30)
+            expectedIds = [i for i, t in providerDf["timestamps"].items() if minTime < t < nt.timestamps and i != nt.Index]
+            assert [n.Index for n in provider.iterPotentialNeighbors(nt)] == expectedIds
+            assert list(provider.getPotentialNeighbors(nt).getColumnValues("timestamps")) == \
+                list(providerDf["timestamps"].loc[expectedIds].values)
+
+
+def test_find_neighbors_batch():
+    df = createDataFrame()
+    queryDf = pd.concat((df.iloc[:5], createDataFrame(5, seed=1).set_index(pd.Index([f"q{i}" for i in range(5)]))))
+    for metric in (EuclideanDistanceMetric("x"), LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x")),
+            (2.0, EuclideanDistanceMetric("y"))]), IdentityDistanceMetric("c")):
+        finder = KNearestNeighboursFinder(metric, AllNeighborsProvider(df))
+        neighborsList = finder.findNeighborsBatch(DataFrameDataPoints(queryDf), 10)
+        assert len(neighborsList) == len(queryDf)
+        if isinstance(metric, EuclideanDistanceMetric):
+            treeNeighborsList = KDTreeKNearestNeighboursFinder(metric, AllNeighborsProvider(df)).findNeighborsBatch(
+                DataFrameDataPoints(queryDf), 10, numThreads=2)
+            assert [[n.identifier for n in neighbors] for neighbors in treeNeighborsList] == \
+                [[n.identifier for n in neighbors] for neighbors in neighborsList]
+        neighborsListThreaded = finder.findNeighborsBatch(DataFrameDataPoints(queryDf), 10, numThreads=3)
+        assert [[n.identifier for n in neighbors] for neighbors in neighborsListThreaded] == \
+            [[n.identifier for n in neighbors] for neighbors in neighborsList]
+        for nt, neighbors in zip(queryDf.itertuples(), neighborsList):
+            expectedNeighbors = finder.findNeighbors(nt, 10)
+            assert [n.identifier for n in neighbors] == [n.identifier for n in expectedNeighbors]
+            assert np.allclose([n.distance for n in neighbors], [n.distance for n in expectedNeighbors])
+
+
+@pytest.mark.parametrize("distanceBasedWeighting, useKDTree", [(False, False), (True, False), (True, True)])
+def test_knn_models(distanceBasedWeighting, useKDTree):
+    df = createDataFrame(100)
+    X, testX = df.iloc[:80], df.iloc[80:]
+    metric = EuclideanDistanceMetric("x")
+    numNeighbors = 5
+    expectedNeighborsList = [findNeighborsNaively(X, nt, metric, numNeighbors) for nt in testX.itertuples()]
+
+    def weights(neighbors):
+        return np.array([1.0 / (d + 1e-3) if distanceBasedWeighting else 1.0 for d, _ in neighbors])
+
+    regressionModel = KNearestNeighboursRegressionModel(numNeighbors, metric, distanceBasedWeighting=distanceBasedWeighting,
+        useKDTree=useKDTree)
+    regressionModel.fit(X[["x"]], X[["y"]])
+    expectedValues = [np.sum(weights(neighbors) * X["y"].loc[[i for _, i in neighbors]].values) / np.sum(weights(neighbors))
+        for neighbors in expectedNeighborsList]
+    assert np.allclose(regressionModel.predict(testX[["x"]])["y"].values, expectedValues)
+
+    classificationModel = KNearestNeighboursClassificationModel(numNeighbors, metric, distanceBasedWeighting=distanceBasedWeighting,
+        useKDTree=useKDTree)
+    classificationModel.fit(X[["x"]], X[["c"]])
+    probabilities = classificationModel.predictClassProbabilities(testX[["x"]])
+    for (_, row), neighbors in zip(probabilities.iterrows(), expectedNeighborsList):
+        labels = X["c"].loc[[i for _, i in neighbors]].values
+        for label in ("a", "b"):
+            assert np.isclose(row[label], np.sum(weights(neighbors)[labels == label]) / np.sum(weights(neighbors)))
+
+
+def test_data_points_subset():
+    df = createDataFrame()
+    dataPoints = DataFrameDataPoints(df)
+    x = dataPoints.getColumnValues("x")
+    assert x.shape == (50, 3)
+    subset = dataPoints.subset(slice(10, 40))
+    assert np.shares_memory(subset.getColumnValues("x"), x)
+    nestedSubset = subset.subset(np.array([0, 5, 29]))
+    assert [nt.Index for nt in nestedSubset.iterNamedTuples()] == ["id10", "id15", "id39"]
+    assert np.array_equal(nestedSubset.getColumnValues("y"), df["y"].values[[10, 15, 39]])
+    assert [nt.Index for nt in subset.subset(slice(None, None, 10)).iterNamedTuples()] == ["id10", "id20", "id30"]
+
+
+def test_vectorised_distances():
+    rand = np.random.RandomState(42)
+    probabilities = rand.uniform(size=(30, 4))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    df = pd.DataFrame({"p": list(probabilities), "bits": list(rand.randint(0, 2, size=(30, 5))), "x": list(rand.normal(size=(30, 3))),
+        "y": rand.normal(size=30), "c": rand.choice(["a", "b", "c"], size=30), "i": rand.randint(0, 3, size=30)})
+    df.loc[0, "bits"][:] = 0
+    df.loc[1, "bits"][:] = 0
+    metrics = [HellingerDistanceMetric("p"), RelativeBitwiseEqualityDistanceMetric("bits"), EuclideanDistanceMetric("x"),
+        EuclideanDistanceMetric("y"), IdentityDistanceMetric(["c", "i"])]
+    dataPoints = DataFrameDataPoints(df)
+    namedTuples = list(df.itertuples())
+    for metric in metrics:
+        expectedDistanceMatrix = np.array([[metric.distance(ntA, ntB) for ntB in namedTuples] for ntA in namedTuples])
+        for i, nt in enumerate(namedTuples):
+            assert np.allclose(metric.distances(nt, dataPoints), expectedDistanceMatrix[i])
+        distanceMatrix = metric.distanceMatrix(dataPoints.subset(slice(10)), dataPoints)
+        if distanceMatrix is not None:
+            assert np.allclose(distanceMatrix, expectedDistanceMatrix[:10])
+
+
+def test_distance_metric_cache():
+    cache = CachingKNearestNeighboursFinder.DistanceMetricCache()
+    cachedMetric = cache.getCachedMetric(EuclideanDistanceMetric("x"))
+    assert cache.getCachedMetric(EuclideanDistanceMetric("x")) is cachedMetric
+    assert cache.getCachedMetric(EuclideanDistanceMetric("y")) is not cachedMetric
+    assert cache.getCachedMetric(HellingerDistanceMetric("x")) is not cachedMetric
+    assert IdentityDistanceMetric(["a", "b"]).getCacheKey() != IdentityDistanceMetric(["a"]).getCacheKey()
+    assert LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x"))]).getCacheKey() == \
+        LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x"))]).getCacheKey()
+
+
+def test_find_neighbors_with_pivot_pruning():
+    df = createDataFrame(200)
+    queryDf = pd.concat((df.iloc[:5], createDataFrame(5, seed=1).set_index(pd.Index([f"q{i}" for i in range(5)]))))
+    for metric in (EuclideanDistanceMetric("x"), LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x")),
+            (0.5, IdentityDistanceMetric("c"))])):
+        assert metric.satisfiesTriangleInequality()
+        finder = KNearestNeighboursFinder(metric, AllNeighborsProvider(df))
+        pruningFinder = KNearestNeighboursFinder(metric, AllNeighborsProvider(df), usePivotPruning=True)
+        for nt in queryDf.itertuples():
+            for n in (1, 10):
+                expectedDistances, expectedPositions = finder.findNeighborPositions(nt, n)
+                distances, positions = pruningFinder.findNeighborPositions(nt, n)
+                assert np.array_equal(positions, expectedPositions)
+                assert np.allclose(distances, expectedDistances)
+
+
+def test_neighbor_provider_positions():
+    df = createDataFrame()
+    provider = AllNeighborsProvider(df)
+    assert provider._indexPositionDict is None
+    assert list(provider.getPositions(["id3", "q", "id0"])) == [3, -1, 0]
+    assert provider.indexPositionDict["id7"] == 7
+
+
+def test_float_dtype():
+    df = createDataFrame()
+    provider = AllNeighborsProvider(df, floatDtype=np.float32)
+    assert provider.dataPoints.getColumnValues("x").dtype == np.float32
+    assert provider.dataPoints.getColumnValues("c").dtype == object
+    metric = LinearCombinationDistanceMetric([(1.0, EuclideanDistanceMetric("x")), (0.5, IdentityDistanceMetric("c"))])
+    finder = CachingKNearestNeighboursFinder(CachingKNearestNeighboursFinder.DistanceMetricCache(dtype=np.float32), metric, provider)
+    for nt in df.iloc[:5].itertuples():
+        distances, positions = finder.findNeighborPositions(nt, 10)
+        expectedNeighbors = findNeighborsNaively(df, nt, metric, 10)
+        assert list(df.index[positions]) == [n[1] for n in expectedNeighbors]
+        assert np.allclose(distances, [n[0] for n in expectedNeighbors], rtol=1e-5)
+
+
+def test_float_dtype_vectorised_distances():
+    rand = np.random.RandomState(42)
+    probabilities = rand.uniform(size=(30, 4))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    df = pd.DataFrame({"p": list(probabilities), "x": list(rand.normal(size=(30, 3)))})
+    dataPoints = DataFrameDataPoints(df)
+    float32DataPoints = DataFrameDataPoints(df, floatDtype=np.float32)
+    for metric in (HellingerDistanceMetric("p"), EuclideanDistanceMetric("x")):
+        for nt in df.iloc[:3].itertuples():
+            distances = metric.distances(nt, float32DataPoints.subset(np.array([5, 2, 7])))
+            assert distances.dtype == np.float32
+            assert np.allclose(distances, metric.distances(nt, dataPoints)[[5, 2, 7]], rtol=1e-5)
+        distanceMatrix = metric.distanceMatrix(float32DataPoints.subset(slice(10)), float32DataPoints)
+        assert distanceMatrix.dtype == np.float32
+        assert np.allclose(distanceMatrix, metric.distanceMatrix(dataPoints.subset(slice(10)), dataPoints), rtol=1e-5, atol=1e-6)
+    sqrtValues = float32DataPoints.getDerivedColumnValues("p", "sqrt", np.sqrt)
+    assert float32DataPoints.getDerivedColumnValues("p", "sqrt", np.sqrt) is sqrtValues
+
+
+def test_kd_tree_finder_requires_plain_euclidean_metric():
+    class WeightedEuclideanDistanceMetric(EuclideanDistanceMetric):
+        def _distance(self, valueA, valueB):
+            return 2 * super()._distance(valueA, valueB)
+
+    provider = AllNeighborsProvider(createDataFrame())
+    assert isinstance(_createKnnFinder(EuclideanDistanceMetric("x"), provider, None, True), KDTreeKNearestNeighboursFinder)
+    assert isinstance(_createKnnFinder(WeightedEuclideanDistanceMetric("x"), provider, None, True), KNearestNeighboursFinder)